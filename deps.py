@@ -1,16 +1,37 @@
 from punq import Container, Scope
 
+from invest.marketdata.alert_dispatcher import (
+    AlertDispatcher,
+    AlertDispatcherSettings,
+)
 from invest.marketdata.notifier import MarketDataNotifier, MarketDataNotifierSettings
 from invest.marketdata.sniffer import (
     MarketDataSniffer,
 )
 from invest.marketdata.settings import MarketDataSnifferSettings
+from invest.marketdata.sharding import ShardedMarketDataSniffer
 from invest.marketdata.share_info.statist_factory import ShareInfoStatistFactory
+from invest.marketdata.share_info.store import ShareStatsStore
+from invest.client_provider import BrokerClientProvider
+from invest.instrument_cache import InstrumentCache, InstrumentCacheSettings
 from invest.invest_settings import InvestSettings
 from invest.portfolio_informer import PortfolioInformer
-from m5stick.settings import OpenAISettings, AudioSettings
+from m5stick.audio_storage import AudioStorage
+from m5stick.preprocessing import AudioPreprocessor
+from m5stick.response_cache import VoiceResponseCache
+from m5stick.settings import (
+    OpenAISettings,
+    AudioSettings,
+    VoiceResponseCacheSettings,
+    AudioPreprocessingSettings,
+)
+from m5stick.voice_pipeline import VoicePipeline
 from rss.rss import RSSFeeder, RSSFeederSettings
+from runtime_settings import RuntimeSettings
 from server import RSSServer
+from smalltv.displays import SmallTVDisplays
+from smalltv.market_feed import SmallTVMarketFeed
+from smalltv.settings import SmallTVSettings
 from telegram_notifier.notifier import TelegramNotifier
 from telegram_notifier.notifier_settings import TelegramNotifierSettings
 
@@ -23,7 +44,16 @@ def get_container() -> Container:
     container.register(
         RSSFeederSettings, instance=RSSFeederSettings(), scope=Scope.singleton
     )
+    container.register(
+        BrokerClientProvider, BrokerClientProvider, scope=Scope.singleton
+    )
     container.register(PortfolioInformer, PortfolioInformer, scope=Scope.singleton)
+    container.register(
+        InstrumentCacheSettings,
+        instance=InstrumentCacheSettings(),
+        scope=Scope.singleton,
+    )
+    container.register(InstrumentCache, InstrumentCache, scope=Scope.singleton)
 
     container.register(
         TelegramNotifierSettings,
@@ -34,7 +64,22 @@ def get_container() -> Container:
 
     container.register(OpenAISettings, instance=OpenAISettings(), scope=Scope.singleton)
     container.register(AudioSettings, instance=AudioSettings(), scope=Scope.singleton)
+    container.register(AudioStorage, AudioStorage, scope=Scope.singleton)
+    container.register(
+        VoiceResponseCacheSettings,
+        instance=VoiceResponseCacheSettings(),
+        scope=Scope.singleton,
+    )
+    container.register(VoiceResponseCache, VoiceResponseCache, scope=Scope.singleton)
+    container.register(
+        AudioPreprocessingSettings,
+        instance=AudioPreprocessingSettings(),
+        scope=Scope.singleton,
+    )
+    container.register(AudioPreprocessor, AudioPreprocessor, scope=Scope.singleton)
+    container.register(VoicePipeline, VoicePipeline, scope=Scope.singleton)
 
+    container.register(ShareStatsStore, ShareStatsStore, scope=Scope.singleton)
     container.register(
         ShareInfoStatistFactory, ShareInfoStatistFactory, scope=Scope.singleton
     )
@@ -44,11 +89,30 @@ def get_container() -> Container:
         scope=Scope.singleton,
     )
     container.register(MarketDataNotifier, MarketDataNotifier, scope=Scope.singleton)
+    container.register(
+        AlertDispatcherSettings,
+        instance=AlertDispatcherSettings(),
+        scope=Scope.singleton,
+    )
+    container.register(AlertDispatcher, AlertDispatcher, scope=Scope.singleton)
     container.register(
         MarketDataSnifferSettings,
         instance=MarketDataSnifferSettings(),
         scope=Scope.singleton,
     )
     container.register(MarketDataSniffer, MarketDataSniffer, scope=Scope.singleton)
+    container.register(
+        ShardedMarketDataSniffer, ShardedMarketDataSniffer, scope=Scope.singleton
+    )
+
+    container.register(
+        SmallTVSettings, instance=SmallTVSettings(), scope=Scope.singleton
+    )
+    container.register(SmallTVDisplays, SmallTVDisplays, scope=Scope.singleton)
+    container.register(SmallTVMarketFeed, SmallTVMarketFeed, scope=Scope.singleton)
+
+    container.register(
+        RuntimeSettings, instance=RuntimeSettings(), scope=Scope.singleton
+    )
 
     return container
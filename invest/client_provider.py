@@ -0,0 +1,60 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from grpc import StatusCode
+from tinkoff.invest import AsyncClient
+from tinkoff.invest.async_services import AsyncServices
+from tinkoff.invest.exceptions import AioRequestError
+
+from invest.invest_settings import InvestSettings
+
+# errors after which the channel is considered broken and is reopened
+CHANNEL_FAILURE_CODES = (StatusCode.UNAVAILABLE, StatusCode.INTERNAL)
+
+
+class BrokerClientProvider:
+    """Shares one long-lived broker gRPC channel between all users."""
+
+    def __init__(self, invest_settings: InvestSettings):
+        self._invest_settings = invest_settings
+        self._client: AsyncClient | None = None
+        self._services: AsyncServices | None = None
+        self._lock = asyncio.Lock()
+
+    @asynccontextmanager
+    async def client(self) -> AsyncIterator[AsyncServices]:
+        services = await self._get_services()
+        try:
+            yield services
+        except (AioRequestError, ConnectionError) as e:
+            if isinstance(e, ConnectionError) or e.code in CHANNEL_FAILURE_CODES:
+                await self._reset(services)
+            raise
+
+    async def close(self):
+        async with self._lock:
+            await self._close()
+
+    def _create_client(self) -> AsyncClient:
+        return AsyncClient(self._invest_settings.token)
+
+    async def _get_services(self) -> AsyncServices:
+        if self._services is not None:
+            return self._services
+        async with self._lock:
+            if self._services is None:
+                self._client = self._create_client()
+                self._services = await self._client.__aenter__()
+            return self._services
+
+    async def _reset(self, services: AsyncServices):
+        async with self._lock:
+            # another user may have reopened the channel already
+            if self._services is services:
+                await self._close()
+
+    async def _close(self):
+        client, self._client, self._services = self._client, None, None
+        if client is not None:
+            await client.__aexit__(None, None, None)
@@ -0,0 +1,90 @@
+import json
+import pickle
+import sqlite3
+import time
+from datetime import timedelta
+
+from pydantic.v1 import BaseSettings
+from tinkoff.invest import Share
+
+
+class InstrumentCacheSettings(BaseSettings):
+    path: str = "instrument_cache.sqlite3"
+    share_ttl: timedelta = timedelta(days=1)
+    favorites_ttl: timedelta = timedelta(hours=1)
+
+    class Config:
+        env_prefix = "INSTRUMENT_CACHE_"
+
+
+class InstrumentCache:
+    """SQLite cache of share metadata and of the watched favorites, keyed by uid."""
+
+    def __init__(self, settings: InstrumentCacheSettings):
+        self._settings = settings
+        self._connection = sqlite3.connect(self._settings.path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS shares ("
+                " uid TEXT PRIMARY KEY, ticker TEXT, fetched_at REAL, share BLOB"
+                ")"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS shares_ticker ON shares (ticker)"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS favorites ("
+                " id INTEGER PRIMARY KEY CHECK (id = 0), uids TEXT, fetched_at REAL"
+                ")"
+            )
+
+    def get_share(self, uid: str) -> Share | None:
+        row = self._connection.execute(
+            "SELECT share FROM shares WHERE uid = ? AND fetched_at > ?",
+            (uid, self._fresh_since(self._settings.share_ttl)),
+        ).fetchone()
+        return pickle.loads(row[0]) if row else None
+
+    def get_share_by_ticker(self, ticker: str) -> Share | None:
+        row = self._connection.execute(
+            "SELECT share FROM shares WHERE ticker = ? AND fetched_at > ?",
+            (ticker, self._fresh_since(self._settings.share_ttl)),
+        ).fetchone()
+        return pickle.loads(row[0]) if row else None
+
+    def put_share(self, share: Share):
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO shares VALUES (?, ?, ?, ?)",
+                (share.uid, share.ticker, time.time(), pickle.dumps(share)),
+            )
+
+    def get_favorite_uids(self) -> list[str] | None:
+        """Returns the cached uids of watched favorites, None once they expired."""
+        row = self._connection.execute(
+            "SELECT uids FROM favorites WHERE fetched_at > ?",
+            (self._fresh_since(self._settings.favorites_ttl),),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_favorite_uids(self, uids: list[str]):
+        """Stores fresh favorites and drops shares that are no longer among them."""
+        row = self._connection.execute("SELECT uids FROM favorites").fetchone()
+        previous_uids = json.loads(row[0]) if row else []
+        removed_uids = set(previous_uids) - set(uids)
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO favorites VALUES (0, ?, ?)",
+                (json.dumps(uids), time.time()),
+            )
+            self._connection.executemany(
+                "DELETE FROM shares WHERE uid = ?", ((uid,) for uid in removed_uids)
+            )
+
+    def invalidate(self):
+        with self._connection:
+            self._connection.execute("DELETE FROM favorites")
+            self._connection.execute("DELETE FROM shares")
+
+    def _fresh_since(self, ttl: timedelta) -> float:
+        return time.time() - ttl.total_seconds()
@@ -0,0 +1,165 @@
+import asyncio
+import dataclasses
+import functools
+import time
+from collections import deque
+from decimal import Decimal
+from enum import Enum
+
+from pydantic.v1 import BaseSettings
+from tinkoff.invest import Share
+
+from invest.marketdata.notifier import MarketDataNotifier
+
+
+class OverflowPolicy(str, Enum):
+    drop_oldest = "drop_oldest"
+    drop_newest = "drop_newest"
+    # replace a queued alert of the same share, drop the oldest one otherwise
+    coalesce = "coalesce"
+
+
+class AlertDispatcherSettings(BaseSettings):
+    queue_size = 100
+    workers = 2
+    overflow_policy = OverflowPolicy.coalesce
+
+    class Config:
+        env_prefix = "ALERT_DISPATCHER_"
+
+
+@dataclasses.dataclass
+class HighChangeAlert:
+    share: Share
+    change_percent: Decimal | float
+    created_at: float
+
+
+@dataclasses.dataclass
+class AlertDispatcherMetrics:
+    queue_depth: int = 0
+    max_queue_depth: int = 0
+    submitted: int = 0
+    sent: int = 0
+    failed: int = 0
+    dropped: int = 0
+    coalesced: int = 0
+    last_latency: float = 0
+    max_latency: float = 0
+    total_latency: float = 0
+
+    @property
+    def mean_latency(self) -> float:
+        if not self.sent:
+            return 0
+        return self.total_latency / self.sent
+
+
+class AlertDispatcher:
+    """Bounded alert queue drained by sender workers.
+
+    ``submit`` never awaits, so the market data stream is never blocked by
+    Telegram round trips.
+    """
+
+    def __init__(
+        self,
+        settings: AlertDispatcherSettings,
+        market_data_notifier: MarketDataNotifier,
+    ):
+        self._settings = settings
+        self._market_data_notifier = market_data_notifier
+
+        self._queue: deque[HighChangeAlert] = deque()
+        self._queued_by_share: dict[str, HighChangeAlert] = {}
+        self._has_alerts = asyncio.Event()
+        self._workers: list[asyncio.Task] = []
+
+        self.metrics = AlertDispatcherMetrics()
+
+    def start(self):
+        if self._workers:
+            return
+        self._workers = [
+            asyncio.create_task(self._work()) for _ in range(self._settings.workers)
+        ]
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def submit(self, share: Share, change_percent: Decimal | float):
+        self.metrics.submitted += 1
+        policy = self._settings.overflow_policy
+
+        if policy == OverflowPolicy.coalesce:
+            queued = self._queued_by_share.get(share.uid)
+            if queued is not None:
+                queued.change_percent = change_percent
+                self.metrics.coalesced += 1
+                return
+
+        if len(self._queue) >= self._settings.queue_size:
+            self.metrics.dropped += 1
+            if policy == OverflowPolicy.drop_newest:
+                return
+            dropped = self._queue.popleft()
+            self._queued_by_share.pop(dropped.share.uid, None)
+
+        alert = HighChangeAlert(
+            share=share, change_percent=change_percent, created_at=time.monotonic()
+        )
+        self._queue.append(alert)
+        self._queued_by_share[share.uid] = alert
+        self._update_queue_depth()
+        self._has_alerts.set()
+
+    async def _work(self):
+        while True:
+            while not self._queue:
+                self._has_alerts.clear()
+                await self._has_alerts.wait()
+            alert = self._queue.popleft()
+            if self._queued_by_share.get(alert.share.uid) is alert:
+                del self._queued_by_share[alert.share.uid]
+            self._update_queue_depth()
+
+            try:
+                delivery = await self._market_data_notifier.notify_high_change(
+                    change_percent=alert.change_percent, share=alert.share
+                )
+            except Exception as e:
+                self._on_failed(alert, e)
+                continue
+            if delivery is None:
+                self._on_sent(alert)
+            else:
+                # digests are sent after their window, the worker moves on
+                delivery.add_done_callback(functools.partial(self._on_delivered, alert))
+
+    def _on_delivered(self, alert: HighChangeAlert, delivery: asyncio.Task):
+        if delivery.cancelled():
+            self._on_failed(alert, asyncio.CancelledError())
+        elif delivery.exception() is not None:
+            self._on_failed(alert, delivery.exception())
+        else:
+            self._on_sent(alert)
+
+    def _on_failed(self, alert: HighChangeAlert, e: BaseException):
+        self.metrics.failed += 1
+        print("Cannot send alert", alert.share.name, e)
+
+    def _on_sent(self, alert: HighChangeAlert):
+        latency = time.monotonic() - alert.created_at
+        self.metrics.sent += 1
+        self.metrics.last_latency = latency
+        self.metrics.max_latency = max(self.metrics.max_latency, latency)
+        self.metrics.total_latency += latency
+
+    def _update_queue_depth(self):
+        self.metrics.queue_depth = len(self._queue)
+        self.metrics.max_queue_depth = max(
+            self.metrics.max_queue_depth, self.metrics.queue_depth
+        )
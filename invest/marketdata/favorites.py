@@ -0,0 +1,23 @@
+from tinkoff.invest import InstrumentType
+from tinkoff.invest.async_services import AsyncServices
+
+from invest.instrument_cache import InstrumentCache
+
+
+async def get_favorite_uids(
+    client: AsyncServices, instrument_cache: InstrumentCache
+) -> list[str]:
+    """Uids of the tradable favorite shares, cached in the instrument cache."""
+    favorite_uids = instrument_cache.get_favorite_uids()
+    if favorite_uids is None:
+        favorites = await client.instruments.get_favorites()
+        favorite_uids = [
+            favorite.uid
+            for favorite in favorites.favorite_instruments
+            if (
+                favorite.api_trade_available_flag
+                and favorite.instrument_kind == InstrumentType.INSTRUMENT_TYPE_SHARE
+            )
+        ]
+        instrument_cache.put_favorite_uids(favorite_uids)
+    return favorite_uids
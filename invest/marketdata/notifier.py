@@ -1,6 +1,9 @@
+import asyncio
 import socket
+import time
 import traceback
-from datetime import datetime
+from datetime import datetime, timedelta
+from decimal import Decimal
 from textwrap import dedent
 
 from pydantic.v1 import BaseSettings
@@ -14,6 +17,13 @@ from telegram_notifier.notifier import TelegramNotifier
 class MarketDataNotifierSettings(BaseSettings):
     send_list_of_shares_on_start: bool = False
 
+    # no repeated alert for a share during the cooldown ...
+    high_change_cooldown: timedelta = timedelta(minutes=5)
+    # ... unless its change grew by this many percentage points or reversed
+    high_change_realert_delta: float = 0.5
+    # alerts raised within the window are sent as one digest message
+    high_change_digest_window: timedelta = timedelta(seconds=3)
+
 
 class MarketDataNotifier:
     def __init__(
@@ -22,9 +32,22 @@ class MarketDataNotifier:
         self._telegram_notifier = telegram_notifier
         self._settings = settings
 
+        # share uid -> (alerted change percent, monotonic alert time)
+        self._last_high_changes: dict[str, tuple[float, float]] = {}
+        # share uid -> (share, alert, the alert it replaced to restore on failure)
+        self._high_changes_digest: dict[
+            str, tuple[Share, tuple[float, float], tuple[float, float] | None]
+        ] = {}
+        self._digest_task: asyncio.Task | None = None
+
     async def notify_about_start(
         self, share_info_containers: dict[str, ShareInfoContainer]
     ):
+        await self.notify_about_start_of_shares(
+            [container.share_info.share for container in share_info_containers.values()]
+        )
+
+    async def notify_about_start_of_shares(self, shares: list[Share]):
         # f'<li><a style="color: {container.share_info.share_info.brand.logo_base_color}">{container.share_info.share_info.name}</a> <img src="{self._get_brand_url(container.share_info.share_info.brand)}" alt="{container.share_info.share_info.brand.logo_name}">'
 
         html_message = dedent(
@@ -35,25 +58,112 @@ class MarketDataNotifier:
         )
         await self._telegram_notifier.send_message(html_message)
         if self._settings.send_list_of_shares_on_start:
-            for container in share_info_containers.values():
-                message = f'<pre>{container.share_info.share.name}</pre><a href="{self._get_brand_url(container.share_info.share.brand)}">link</a>'
-                await self._telegram_notifier.send_message(message)
+            # queued together, so the notifier merges them into few requests
+            await asyncio.gather(
+                *(
+                    self._telegram_notifier.send_message(
+                        f'<pre>{share.name}</pre><a href="{self._get_brand_url(share.brand)}">link</a>'
+                    )
+                    for share in shares
+                )
+            )
         else:
             await self._telegram_notifier.send_message(
-                "\n".join(
-                    container.share_info.share.name
-                    for container in share_info_containers.values()
+                "\n".join(share.name for share in shares)
+            )
+
+    async def notify_high_change(
+        self, change_percent: Decimal | float, share: Share
+    ) -> asyncio.Task | None:
+        """Returns the digest delivery the alert waits for, None once it is done.
+
+        The caller is not held for the digest window, the task fails if the
+        digest cannot be sent.
+        """
+        change_percent = float(change_percent)
+        if not self._should_notify_high_change(change_percent, share):
+            return None
+
+        # recorded before the send, so alerts raised while it is in flight are
+        # suppressed, and rolled back if it fails
+        alerted = (change_percent, time.monotonic())
+        pending = self._high_changes_digest.get(share.uid)
+        previous = pending[2] if pending else self._last_high_changes.get(share.uid)
+        self._last_high_changes[share.uid] = alerted
+
+        if not self._settings.high_change_digest_window:
+            try:
+                await self._telegram_notifier.send_message(
+                    self._format_high_change(change_percent, share)
+                )
+            except BaseException:
+                self._rollback_high_change(share.uid, alerted, previous)
+                raise
+            return None
+
+        self._high_changes_digest[share.uid] = (share, alerted, previous)
+        if self._digest_task is None:
+            self._digest_task = asyncio.create_task(self._send_high_changes_digest())
+        return self._digest_task
+
+    def _should_notify_high_change(self, change_percent: float, share: Share) -> bool:
+        last_high_change = self._last_high_changes.get(share.uid)
+        if last_high_change is None:
+            return True
+        last_change_percent, notified_at = last_high_change
+        if (
+            time.monotonic() - notified_at
+            >= self._settings.high_change_cooldown.total_seconds()
+        ):
+            return True
+        if (change_percent < 0) != (last_change_percent < 0):
+            return True
+        return (
+            abs(change_percent) - abs(last_change_percent)
+            >= self._settings.high_change_realert_delta
+        )
+
+    async def _send_high_changes_digest(self):
+        try:
+            try:
+                await asyncio.sleep(
+                    self._settings.high_change_digest_window.total_seconds()
+                )
+            finally:
+                digest, self._high_changes_digest = self._high_changes_digest, {}
+                self._digest_task = None
+            movers = sorted(digest.values(), key=lambda mover: -abs(mover[1][0]))
+            await self._telegram_notifier.send_message(
+                "".join(
+                    self._format_high_change(change_percent, share)
+                    for share, (change_percent, _), _ in movers
                 )
             )
+        except BaseException:
+            for share, alerted, previous in digest.values():
+                self._rollback_high_change(share.uid, alerted, previous)
+            raise
 
-    async def notify_high_change(self, change_percent: float, share: Share):
+    def _rollback_high_change(
+        self,
+        uid: str,
+        alerted: tuple[float, float],
+        previous: tuple[float, float] | None,
+    ):
+        # a newer alert of the share is kept
+        if self._last_high_changes.get(uid) is not alerted:
+            return
+        if previous is None:
+            del self._last_high_changes[uid]
+        else:
+            self._last_high_changes[uid] = previous
+
+    def _format_high_change(self, change_percent: float, share: Share) -> str:
         formatted_change_percent = f"{change_percent:.2f}%"
-        await self._telegram_notifier.send_message(
-            dedent(
-                f"""\
-                {"📉" if change_percent < 0 else "📈"} {formatted_change_percent} <pre>{share.name}</pre>
-                """
-            )
+        return dedent(
+            f"""\
+            {"📉" if change_percent < 0 else "📈"} {formatted_change_percent} <pre>{share.name}</pre>
+            """
         )
 
     def _get_brand_url(self, brand: BrandData, size=160):
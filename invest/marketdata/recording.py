@@ -0,0 +1,261 @@
+import asyncio
+import dataclasses
+import struct
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterable, AsyncIterator, BinaryIO, Callable
+
+from tinkoff.invest import GetCandlesResponse, MarketDataResponse, Share
+from tinkoff.invest._grpc_helpers import dataclass_to_protobuff, protobuf_to_dataclass
+from tinkoff.invest.async_services import AsyncServices
+from tinkoff.invest.grpc import instruments_pb2, marketdata_pb2
+
+from invest.client_provider import BrokerClientProvider
+from invest.instrument_cache import InstrumentCache
+from invest.invest_settings import InvestSettings
+from invest.marketdata.sharding import decode_uid, encode_uid
+
+MAGIC = b"MDREC1\n"
+# kind, nanoseconds since the recording started, payload size
+RECORD_HEADER = struct.Struct("<BQI")
+# instruments_pb2.Share
+SHARE = 1
+# 16 uuid bytes of the instrument, then marketdata_pb2.GetCandlesResponse
+CANDLES = 2
+# marketdata_pb2.MarketDataResponse as received from the stream
+MARKET_DATA = 3
+
+
+class MarketDataRecorder:
+    """Writes broker responses to a file of length-prefixed protobuf records."""
+
+    def __init__(self, path: str, clock: Callable[[], int] = time.monotonic_ns):
+        self._clock = clock
+        self._started_at = clock()
+        self._file: BinaryIO = open(path, "wb")
+        self._file.write(MAGIC)
+        self.records = 0
+
+    def record_share(self, share: Share):
+        self._write(SHARE, dataclass_to_protobuff(share, instruments_pb2.Share()))
+
+    def record_candles(self, instrument_uid: str, response: GetCandlesResponse):
+        self._write(
+            CANDLES,
+            dataclass_to_protobuff(response, marketdata_pb2.GetCandlesResponse()),
+            prefix=encode_uid(instrument_uid),
+        )
+
+    def record_market_data(self, response: MarketDataResponse):
+        self._write(
+            MARKET_DATA,
+            dataclass_to_protobuff(response, marketdata_pb2.MarketDataResponse()),
+        )
+
+    def close(self):
+        self._file.close()
+
+    def _write(self, kind: int, message, prefix: bytes = b""):
+        payload = prefix + message.SerializeToString()
+        self._file.write(
+            RECORD_HEADER.pack(kind, self._clock() - self._started_at, len(payload))
+        )
+        self._file.write(payload)
+        self.records += 1
+
+
+@dataclasses.dataclass
+class MarketDataRecording:
+    shares: list[Share]
+    candles: dict[str, GetCandlesResponse]
+    # (nanoseconds since the recording started, serialized MarketDataResponse),
+    # decoded only when replayed, as the broker client decodes them on arrival
+    market_data: list[tuple[int, bytes]]
+
+    @classmethod
+    def load(cls, path: str) -> "MarketDataRecording":
+        recording = cls(shares=[], candles={}, market_data=[])
+        with open(path, "rb") as file:
+            if file.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a market data recording")
+            while header := file.read(RECORD_HEADER.size):
+                kind, offset, size = RECORD_HEADER.unpack(header)
+                payload = file.read(size)
+                if kind == SHARE:
+                    recording.shares.append(
+                        protobuf_to_dataclass(
+                            instruments_pb2.Share.FromString(payload), Share
+                        )
+                    )
+                elif kind == CANDLES:
+                    # candles of a reconnect only fill the gap, the first ones are kept
+                    recording.candles.setdefault(
+                        decode_uid(payload[:16]),
+                        protobuf_to_dataclass(
+                            marketdata_pb2.GetCandlesResponse.FromString(payload[16:]),
+                            GetCandlesResponse,
+                        ),
+                    )
+                elif kind == MARKET_DATA:
+                    recording.market_data.append((offset, payload))
+        return recording
+
+    def fill_instrument_cache(self, instrument_cache: InstrumentCache):
+        """Makes the recorded shares the watched favorites."""
+        for share in self.shares:
+            instrument_cache.put_share(share)
+        instrument_cache.put_favorite_uids([share.uid for share in self.shares])
+
+
+class _RecordingInstruments:
+    def __init__(self, instruments, recorder: MarketDataRecorder):
+        self._instruments = instruments
+        self._recorder = recorder
+
+    def __getattr__(self, name):
+        return getattr(self._instruments, name)
+
+    async def share_by(self, **kwargs):
+        response = await self._instruments.share_by(**kwargs)
+        self._recorder.record_share(response.instrument)
+        return response
+
+
+class _RecordingMarketData:
+    def __init__(self, market_data, recorder: MarketDataRecorder):
+        self._market_data = market_data
+        self._recorder = recorder
+
+    def __getattr__(self, name):
+        return getattr(self._market_data, name)
+
+    async def get_candles(self, **kwargs) -> GetCandlesResponse:
+        response = await self._market_data.get_candles(**kwargs)
+        self._recorder.record_candles(kwargs["instrument_id"], response)
+        return response
+
+
+class _RecordingMarketDataStream:
+    def __init__(self, market_data_stream, recorder: MarketDataRecorder):
+        self._market_data_stream = market_data_stream
+        self._recorder = recorder
+
+    def __getattr__(self, name):
+        return getattr(self._market_data_stream, name)
+
+    async def market_data_stream(
+        self, requests: AsyncIterable
+    ) -> AsyncIterator[MarketDataResponse]:
+        async for response in self._market_data_stream.market_data_stream(requests):
+            self._recorder.record_market_data(response)
+            yield response
+
+
+class _RecordingServices:
+    def __init__(self, services: AsyncServices, recorder: MarketDataRecorder):
+        self._services = services
+        self.instruments = _RecordingInstruments(services.instruments, recorder)
+        self.market_data = _RecordingMarketData(services.market_data, recorder)
+        self.market_data_stream = _RecordingMarketDataStream(
+            services.market_data_stream, recorder
+        )
+
+    def __getattr__(self, name):
+        return getattr(self._services, name)
+
+
+class RecordingBrokerClientProvider(BrokerClientProvider):
+    """Records the shares, candles and stream the sniffer receives."""
+
+    def __init__(self, invest_settings: InvestSettings, recorder: MarketDataRecorder):
+        super().__init__(invest_settings)
+        self._recorder = recorder
+
+    @asynccontextmanager
+    async def client(self) -> AsyncIterator[AsyncServices]:
+        async with super().client() as services:
+            yield _RecordingServices(services, self._recorder)
+
+
+@dataclasses.dataclass
+class ReplayStats:
+    messages: int = 0
+    started_at: float = 0
+    finished_at: float = 0
+    # from decoding a message until the stream consumer asks for the next one
+    latencies: list[float] = dataclasses.field(default_factory=list)
+
+    @property
+    def elapsed(self) -> float:
+        return self.finished_at - self.started_at
+
+
+class _ReplayMarketData:
+    def __init__(self, recording: MarketDataRecording):
+        self._recording = recording
+
+    async def get_candles(self, instrument_id: str, **kwargs) -> GetCandlesResponse:
+        return self._recording.candles.get(
+            instrument_id, GetCandlesResponse(candles=[])
+        )
+
+
+class _ReplayServices:
+    def __init__(self, provider: "ReplayBrokerClientProvider"):
+        self.market_data = _ReplayMarketData(provider.recording)
+        self.market_data_stream = provider
+
+
+class ReplayBrokerClientProvider:
+    """Serves a recording in place of the broker.
+
+    Shares and favorites come from the instrument cache, see
+    ``MarketDataRecording.fill_instrument_cache``. The stream is replayed at the
+    recorded pace multiplied by ``speed``, or as fast as it is consumed.
+    """
+
+    def __init__(self, recording: MarketDataRecording, speed: float | None = None):
+        self.recording = recording
+        self._speed = speed
+        self.stats = ReplayStats()
+        self.finished = asyncio.Event()
+
+    @asynccontextmanager
+    async def client(self) -> AsyncIterator[_ReplayServices]:
+        yield _ReplayServices(self)
+
+    async def close(self):
+        pass
+
+    async def market_data_stream(
+        self, requests: AsyncIterable
+    ) -> AsyncIterator[MarketDataResponse]:
+        stats = self.stats
+        market_data = self.recording.market_data
+        # the pace is kept from the first message, startup is not replayed
+        first_offset = market_data[0][0] if market_data else 0
+        started_at = time.monotonic()
+        stats.started_at = time.perf_counter()
+        for offset, payload in market_data:
+            if self._speed:
+                delay = (
+                    started_at
+                    + (offset - first_offset) / 1e9 / self._speed
+                    - time.monotonic()
+                )
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            else:
+                # the live stream awaits the network between messages
+                await asyncio.sleep(0)
+            received_at = time.perf_counter()
+            yield protobuf_to_dataclass(
+                marketdata_pb2.MarketDataResponse.FromString(payload),
+                MarketDataResponse,
+            )
+            stats.latencies.append(time.perf_counter() - received_at)
+            stats.messages += 1
+        stats.finished_at = time.perf_counter()
+        self.finished.set()
+        # like the live stream, it stays open after the last message
+        await asyncio.Event().wait()
@@ -1,9 +1,33 @@
 from datetime import timedelta
+from enum import Enum
 
 from pydantic.v1 import BaseSettings
 from tinkoff.invest import SubscriptionInterval
 
 
+# duration of the candles of each subscription interval
+CANDLE_STEPS = {
+    SubscriptionInterval.SUBSCRIPTION_INTERVAL_ONE_MINUTE: timedelta(minutes=1),
+    SubscriptionInterval.SUBSCRIPTION_INTERVAL_2_MIN: timedelta(minutes=2),
+    SubscriptionInterval.SUBSCRIPTION_INTERVAL_3_MIN: timedelta(minutes=3),
+    SubscriptionInterval.SUBSCRIPTION_INTERVAL_FIVE_MINUTES: timedelta(minutes=5),
+    SubscriptionInterval.SUBSCRIPTION_INTERVAL_10_MIN: timedelta(minutes=10),
+    SubscriptionInterval.SUBSCRIPTION_INTERVAL_FIFTEEN_MINUTES: timedelta(minutes=15),
+    SubscriptionInterval.SUBSCRIPTION_INTERVAL_30_MIN: timedelta(minutes=30),
+    SubscriptionInterval.SUBSCRIPTION_INTERVAL_ONE_HOUR: timedelta(hours=1),
+    SubscriptionInterval.SUBSCRIPTION_INTERVAL_2_HOUR: timedelta(hours=2),
+    SubscriptionInterval.SUBSCRIPTION_INTERVAL_4_HOUR: timedelta(hours=4),
+    SubscriptionInterval.SUBSCRIPTION_INTERVAL_ONE_DAY: timedelta(days=1),
+}
+
+
+class StatistBackend(str, Enum):
+    deque = "deque"
+    columnar = "columnar"
+    # deque statist with prices as scaled ints instead of Decimal
+    fixed_point = "fixed_point"
+
+
 class MarketDataSnifferSettings(BaseSettings):
     last_candles_count = 5
     last_trades_count = 100
@@ -11,7 +35,27 @@ class MarketDataSnifferSettings(BaseSettings):
     interval = SubscriptionInterval.SUBSCRIPTION_INTERVAL_ONE_MINUTE
     change_percent_threshold = 0.5
 
+    statist_backend = StatistBackend.deque
+    columnar_store_capacity = 64
+    monitor_interval = timedelta(seconds=1)
+
+    # broker calls made concurrently while (re)starting the stream
+    startup_concurrency = 10
+    startup_call_timeout = timedelta(seconds=10)
+
+    # reconnect backoff grows from on_error_min_sleep up to on_error_sleep
+    on_error_min_sleep: timedelta = timedelta(milliseconds=200)
     on_error_sleep: timedelta = timedelta(seconds=10)
 
+    # favorites are split between this many shard processes, each with its own
+    # stream
+    shards = 1
+    pin_shards = False
+    shard_stats_interval = timedelta(seconds=10)
+
+    @property
+    def candle_step(self) -> timedelta:
+        return CANDLE_STEPS[self.interval]
+
     class Config:
         env_prefix = "MARKETDATA_"
@@ -0,0 +1,370 @@
+import asyncio
+import dataclasses
+import multiprocessing
+import os
+import struct
+import time
+import traceback
+import uuid
+from decimal import Decimal
+from multiprocessing.connection import Connection
+from multiprocessing.process import BaseProcess
+from typing import Coroutine
+
+from dotenv import load_dotenv
+from tinkoff.invest import Share
+
+from invest.client_provider import BrokerClientProvider
+from invest.instrument_cache import InstrumentCache
+from invest.marketdata.alert_dispatcher import AlertDispatcher
+from invest.marketdata.favorites import get_favorite_uids
+from invest.marketdata.notifier import MarketDataNotifier
+from invest.marketdata.settings import MarketDataSnifferSettings
+from invest.marketdata.share_info.container import ShareInfoContainer
+
+# Frames sent by shard processes over their pipe, little endian.
+# alert: uid as 16 uuid bytes and the change percent
+ALERT = 1
+ALERT_FRAME = struct.Struct("<B16sd")
+# start: shard index, followed by 16 uuid bytes per watched share
+START = 2
+START_FRAME = struct.Struct("<BH")
+# stats: shard index, watched shares, messages, submitted alerts, process cpu time
+STATS = 3
+STATS_FRAME = struct.Struct("<BHIQQd")
+# error: shard index, followed by the utf-8 traceback
+ERROR = 4
+ERROR_FRAME = struct.Struct("<BH")
+MAX_ERROR_SIZE = 4000
+
+
+def encode_uid(uid: str) -> bytes:
+    return uuid.UUID(uid).bytes
+
+
+def decode_uid(data: bytes) -> str:
+    return str(uuid.UUID(bytes=data))
+
+
+class ShardError(Exception):
+    """An error raised in a shard process, carrying its formatted traceback."""
+
+    def __init__(self, shard_index: int, error: str):
+        super().__init__(f"shard {shard_index}:\n{error}")
+        self.shard_index = shard_index
+
+
+class ShardUplink:
+    """Stands in for the alert dispatcher and the notifier of a shard process.
+
+    Alerts, errors and stats are written to the coordinator as compact binary
+    frames, so only the coordinator talks to Telegram.
+    """
+
+    def __init__(self, shard_index: int, connection: Connection):
+        self._shard_index = shard_index
+        self._connection = connection
+        self.shares = 0
+        self.alerts = 0
+
+    def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def submit(self, share: Share, change_percent: Decimal | float):
+        self.alerts += 1
+        self._send(
+            ALERT_FRAME.pack(ALERT, encode_uid(share.uid), float(change_percent))
+        )
+
+    async def notify_about_start(
+        self, share_info_containers: dict[str, ShareInfoContainer]
+    ):
+        self.shares = len(share_info_containers)
+        self._send(
+            START_FRAME.pack(START, self._shard_index)
+            + b"".join(encode_uid(uid) for uid in share_info_containers)
+        )
+
+    async def notify_error(self, e):
+        error = "".join(traceback.format_exception(type(e), e, e.__traceback__))
+        self._send(
+            ERROR_FRAME.pack(ERROR, self._shard_index)
+            + error.encode()[-MAX_ERROR_SIZE:]
+        )
+
+    def send_stats(self, messages: int):
+        self._send(
+            STATS_FRAME.pack(
+                STATS,
+                self._shard_index,
+                self.shares,
+                messages,
+                self.alerts,
+                time.process_time(),
+            )
+        )
+
+    def _send(self, frame: bytes):
+        try:
+            self._connection.send_bytes(frame)
+        except OSError as e:
+            # the coordinator is gone, the shard is about to be stopped
+            print("shard", self._shard_index, "cannot reach the coordinator", e)
+
+
+def run_shard(shard_index: int, uids: list[str], connection: Connection):
+    """Entry point of a shard process watching the given share uids."""
+    load_dotenv()
+
+    from deps import get_container
+    from invest.marketdata.sniffer import MarketDataSniffer
+
+    container = get_container()
+    settings = container.resolve(MarketDataSnifferSettings)
+    if settings.pin_shards and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {shard_index % os.cpu_count()})
+
+    uplink = ShardUplink(shard_index, connection)
+    container.register(AlertDispatcher, instance=uplink)
+    container.register(MarketDataNotifier, instance=uplink)
+    sniffer = container.resolve(MarketDataSniffer)
+    sniffer.watched_uids = uids
+
+    async def report_stats():
+        while True:
+            await asyncio.sleep(settings.shard_stats_interval.total_seconds())
+            uplink.send_stats(sniffer.messages_received)
+
+    async def run():
+        reporter = asyncio.create_task(report_stats())
+        try:
+            await sniffer.run()
+        finally:
+            reporter.cancel()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+@dataclasses.dataclass
+class ShardStats:
+    shares: int = 0
+    messages: int = 0
+    alerts: int = 0
+    cpu_time: float = 0
+    starts: int = 0
+
+
+class ShardedMarketDataSniffer:
+    """Splits favorites between shard processes, each running its own sniffer.
+
+    Favorites are resolved here once and every shard gets its slice of them,
+    so shards never overlap or miss a share, restarted ones included.
+
+    Shard processes have their own market data stream and statistics, and
+    funnel alerts, errors and stats back over a pipe. Alerts go through the
+    single alert dispatcher of this process, so cooldowns and digests work
+    across shards.
+    """
+
+    def __init__(
+        self,
+        broker_client_provider: BrokerClientProvider,
+        market_data_sniffer_settings: MarketDataSnifferSettings,
+        alert_dispatcher: AlertDispatcher,
+        market_data_notifier: MarketDataNotifier,
+        instrument_cache: InstrumentCache,
+    ):
+        self._broker_client_provider = broker_client_provider
+        self._settings = market_data_sniffer_settings
+        self._alert_dispatcher = alert_dispatcher
+        self._market_data_notifier = market_data_notifier
+        self._instrument_cache = instrument_cache
+        # grpc does not survive fork
+        self._context = multiprocessing.get_context("spawn")
+
+        self._shares: dict[str, Share] = {}
+        self._watched_uids: list[list[str]] = []
+        self._shard_uids: dict[int, list[str]] = {}
+        self._announced_uids: set[str] = set()
+        self._notifications: set[asyncio.Task] = set()
+        self.stats = {shard: ShardStats() for shard in range(self._settings.shards)}
+        self._is_running = False
+
+    def stop(self):
+        self._is_running = False
+
+    async def run(self):
+        self._is_running = True
+        self._watched_uids = await self._split_favorites()
+        self._alert_dispatcher.start()
+        shards = [
+            asyncio.create_task(self._run_shard(shard))
+            for shard in range(self._settings.shards)
+        ]
+        reporter = asyncio.create_task(self._report_stats())
+        try:
+            await asyncio.gather(*shards)
+        finally:
+            self.stop()
+            reporter.cancel()
+            for shard in shards:
+                shard.cancel()
+            await asyncio.gather(*shards, return_exceptions=True)
+            await self._alert_dispatcher.stop()
+
+    async def _split_favorites(self) -> list[list[str]]:
+        while True:
+            try:
+                async with self._broker_client_provider.client() as client:
+                    uids = await asyncio.wait_for(
+                        get_favorite_uids(client, self._instrument_cache),
+                        self._settings.startup_call_timeout.total_seconds(),
+                    )
+                break
+            except Exception as e:
+                print("cannot resolve favorites", e)
+                await self._market_data_notifier.notify_error(e)
+                await asyncio.sleep(self._settings.on_error_sleep.total_seconds())
+        uids = sorted(uids)
+        return [
+            uids[shard_index :: self._settings.shards]
+            for shard_index in range(self._settings.shards)
+        ]
+
+    async def _run_shard(self, shard_index: int):
+        while self._is_running:
+            exitcode = await self._run_shard_process(shard_index)
+            if not self._is_running:
+                return
+            print("shard", shard_index, "exited with", exitcode, "restarting")
+            await asyncio.sleep(self._settings.on_error_sleep.total_seconds())
+
+    async def _run_shard_process(self, shard_index: int) -> int | None:
+        loop = asyncio.get_running_loop()
+        receiver, sender = self._context.Pipe(duplex=False)
+        process = self._context.Process(
+            target=run_shard,
+            args=(shard_index, self._watched_uids[shard_index], sender),
+            name=f"marketdata-shard-{shard_index}",
+            daemon=True,
+        )
+        process.start()
+        # only the child writes, so the pipe reports EOF once it exits
+        sender.close()
+        self.stats[shard_index].starts += 1
+
+        exited = asyncio.Event()
+        loop.add_reader(receiver.fileno(), self._receive, receiver)
+        loop.add_reader(process.sentinel, exited.set)
+        try:
+            await exited.wait()
+        finally:
+            loop.remove_reader(process.sentinel)
+            await self._terminate(process)
+            # frames written right before the exit are still handled
+            self._receive(receiver)
+            loop.remove_reader(receiver.fileno())
+            receiver.close()
+        return process.exitcode
+
+    async def _terminate(self, process: BaseProcess):
+        if process.is_alive():
+            process.terminate()
+        await asyncio.to_thread(process.join, 5)
+        if process.is_alive():
+            process.kill()
+            await asyncio.to_thread(process.join)
+
+    def _receive(self, receiver: Connection):
+        try:
+            while receiver.poll():
+                self._handle_frame(receiver.recv_bytes())
+        except (EOFError, OSError):
+            pass
+
+    def _handle_frame(self, frame: bytes):
+        kind = frame[0]
+        if kind == ALERT:
+            _, uid, change_percent = ALERT_FRAME.unpack(frame)
+            share = self._get_share(decode_uid(uid))
+            if share is not None:
+                self._alert_dispatcher.submit(
+                    share=share, change_percent=change_percent
+                )
+        elif kind == START:
+            _, shard_index = START_FRAME.unpack_from(frame)
+            body = frame[START_FRAME.size :]
+            uids = [decode_uid(body[i : i + 16]) for i in range(0, len(body), 16)]
+            self._shard_uids[shard_index] = uids
+            for uid in uids:
+                self._get_share(uid)
+            self._announce_start()
+        elif kind == STATS:
+            _, shard_index, shares, messages, alerts, cpu_time = STATS_FRAME.unpack(
+                frame
+            )
+            stats = self.stats[shard_index]
+            stats.shares = shares
+            stats.messages = messages
+            stats.alerts = alerts
+            stats.cpu_time = cpu_time
+        elif kind == ERROR:
+            _, shard_index = ERROR_FRAME.unpack_from(frame)
+            error = ShardError(
+                shard_index, frame[ERROR_FRAME.size :].decode(errors="replace")
+            )
+            self._notify(self._market_data_notifier.notify_error(error))
+        else:
+            print("unknown shard frame", kind)
+
+    def _get_share(self, uid: str) -> Share | None:
+        # shards put every watched share into the instrument cache before
+        # they start, shares are kept here as they expire there
+        share = self._shares.get(uid)
+        if share is None:
+            share = self._instrument_cache.get_share(uid)
+            if share is None:
+                print("shard share is not cached", uid)
+                return None
+            self._shares[uid] = share
+        return share
+
+    def _announce_start(self):
+        # one message for all shards, once every one of them has started
+        if len(self._shard_uids) < self._settings.shards:
+            return
+        uids = [uid for uids in self._shard_uids.values() for uid in uids]
+        if set(uids) <= self._announced_uids:
+            return
+        self._announced_uids.update(uids)
+        shares = [self._shares[uid] for uid in uids if uid in self._shares]
+        self._notify(self._market_data_notifier.notify_about_start_of_shares(shares))
+
+    def _notify(self, notification: Coroutine):
+        # frames are handled in a reader callback, so notifications run on their own
+        task = asyncio.create_task(notification)
+        self._notifications.add(task)
+        task.add_done_callback(self._notifications.discard)
+
+    async def _report_stats(self):
+        interval = self._settings.shard_stats_interval.total_seconds()
+        previous_messages = 0
+        while True:
+            await asyncio.sleep(interval)
+            messages = sum(stats.messages for stats in self.stats.values())
+            print(
+                "sharded sniffer:",
+                f"{sum(stats.shares for stats in self.stats.values())} shares,",
+                # counters of a restarted shard start over
+                f"{max(0, messages - previous_messages) / interval:.1f} messages/s,",
+                f"{sum(stats.alerts for stats in self.stats.values())} alerts,",
+                "cpu",
+                ", ".join(f"{stats.cpu_time:.1f}s" for stats in self.stats.values()),
+            )
+            previous_messages = messages
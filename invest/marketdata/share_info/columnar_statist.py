@@ -0,0 +1,47 @@
+from _decimal import Decimal
+from datetime import datetime
+from statistics import StatisticsError
+
+from tinkoff.invest import Candle, Quotation, Trade
+
+from invest.marketdata.share_info.store import PRICE_SCALE, ShareStatsStore
+
+
+class ColumnarShareInfoStatist:
+    """ShareInfoStatist interface over a slot of the shared ShareStatsStore."""
+
+    def __init__(self, store: ShareStatsStore, slot: int):
+        self._store = store
+        self.slot = slot
+
+    def observe_candle_mean(self, candle: Candle) -> Decimal:
+        row_sum = self._store.observe_candle(self.slot, candle)
+        return Decimal(row_sum) / (4 * PRICE_SCALE)
+
+    @property
+    def last_candle_time(self) -> datetime | None:
+        return self._store.last_candle_time(self.slot)
+
+    @property
+    def last_candles_mean(self) -> Decimal:
+        if not self._store.candle_count[self.slot]:
+            raise StatisticsError("mean requires at least one data point")
+        return self._store.candles_mean(self.slot)
+
+    def observe_last_price(self, price: Quotation):
+        self._store.observe_last_price(self.slot, price)
+
+    def observe_trade(self, trade: Trade):
+        self._store.observe_trade(self.slot, trade)
+
+    @property
+    def last_trades_mean_volume(self) -> float:
+        if not self._store.trade_count[self.slot]:
+            raise StatisticsError("mean requires at least one data point")
+        return self._store.trades_mean_quantity(self.slot)
+
+    @property
+    def last_trades_mean_volume_per_second(self) -> float:
+        if not self._store.trade_count[self.slot]:
+            return 0
+        return float(self._store.volumes_per_second(self.slot)[0])
@@ -0,0 +1,136 @@
+from _decimal import Decimal
+from collections import deque
+from datetime import datetime
+from fractions import Fraction
+from statistics import StatisticsError
+
+from tinkoff.invest import Candle, Quotation, Trade
+from tinkoff.invest.utils import now
+
+from invest.marketdata.settings import MarketDataSnifferSettings
+from invest.marketdata.share_info.store import PRICE_SCALE, quotation_to_scaled
+
+
+class FixedPointShareInfoStatist:
+    """ShareInfoStatist over prices kept as ints scaled by ``PRICE_SCALE``.
+
+    The threshold check of every last price is integer arithmetic only, the
+    change percent is converted to Decimal once an alert is raised.
+    """
+
+    def __init__(self, marked_data_sniffer_settings: MarketDataSnifferSettings):
+        self._settings = marked_data_sniffer_settings
+
+        # open + high + low + close of each candle, scaled
+        self.last_candle_sums: deque[int] = deque(
+            maxlen=self._settings.last_candles_count
+        )
+        self.last_candles: deque[Candle] = deque(
+            maxlen=self._settings.last_candles_count
+        )
+        self.last_trades: deque[Trade] = deque(maxlen=self._settings.last_trades_count)
+
+        self._candle_sums_sum = 0
+        self._trades_quantity_sum = 0
+
+        # trades still inside the scrape span, as (time, second, scaled volume)
+        self._span_trades: deque[tuple[datetime, datetime, int]] = deque()
+        self._trades_per_second: dict[datetime, int] = {}
+        self._span_volume_sum = 0
+
+        # |change percent| > threshold as
+        # |price - mean| * 100 * denominator > numerator * mean
+        threshold = Fraction(str(self._settings.change_percent_threshold))
+        self._threshold_numerator = threshold.numerator
+        self._threshold_denominator = threshold.denominator * 100
+
+    def observe_candle_mean(self, candle: Candle) -> Decimal:
+        self.last_candles.append(candle)
+        candle_sum = (
+            quotation_to_scaled(candle.open)
+            + quotation_to_scaled(candle.close)
+            + quotation_to_scaled(candle.high)
+            + quotation_to_scaled(candle.low)
+        )
+        if len(self.last_candle_sums) == self.last_candle_sums.maxlen:
+            self._candle_sums_sum -= self.last_candle_sums[0]
+        self.last_candle_sums.append(candle_sum)
+        self._candle_sums_sum += candle_sum
+        return Decimal(candle_sum) / (4 * PRICE_SCALE)
+
+    @property
+    def last_candle_time(self) -> datetime | None:
+        if not self.last_candles:
+            return None
+        return self.last_candles[-1].time
+
+    @property
+    def last_candles_mean(self) -> Decimal:
+        if not self.last_candle_sums:
+            raise StatisticsError("mean requires at least one data point")
+        return Decimal(self._candle_sums_sum) / (
+            4 * len(self.last_candle_sums) * PRICE_SCALE
+        )
+
+    def is_high_change(self, price: Quotation) -> bool:
+        """Whether the price moved from the candles mean by more than the threshold."""
+        if not self.last_candle_sums:
+            raise StatisticsError("mean requires at least one data point")
+        # both sides are multiplied by 4 * candles count * PRICE_SCALE
+        deviation = abs(
+            quotation_to_scaled(price) * 4 * len(self.last_candle_sums)
+            - self._candle_sums_sum
+        )
+        return (
+            deviation * self._threshold_denominator
+            > self._threshold_numerator * self._candle_sums_sum
+        )
+
+    def change_percent(self, price: Quotation) -> Decimal:
+        if not self.last_candle_sums:
+            raise StatisticsError("mean requires at least one data point")
+        deviation = (
+            quotation_to_scaled(price) * 4 * len(self.last_candle_sums)
+            - self._candle_sums_sum
+        )
+        return Decimal(deviation) / Decimal(self._candle_sums_sum) * 100
+
+    def observe_trade(self, trade: Trade):
+        if len(self.last_trades) == self.last_trades.maxlen:
+            self._trades_quantity_sum -= self.last_trades[0].quantity
+            if len(self._span_trades) == len(self.last_trades):
+                self._evict_span_trade()
+        self.last_trades.append(trade)
+        self._trades_quantity_sum += trade.quantity
+
+        second = trade.time.replace(microsecond=0)
+        volume = quotation_to_scaled(trade.price) * trade.quantity
+        self._span_trades.append((trade.time, second, volume))
+        self._trades_per_second[second] = self._trades_per_second.get(second, 0) + 1
+        self._span_volume_sum += volume
+
+    @property
+    def last_trades_mean_volume(self) -> float:
+        if not self.last_trades:
+            raise StatisticsError("mean requires at least one data point")
+        return self._trades_quantity_sum / len(self.last_trades)
+
+    @property
+    def last_trades_mean_volume_per_second(self) -> float:
+        if not self.last_trades:
+            return 0
+        scrape_time = now() - self._settings.last_trades_scrape_span
+        while self._span_trades and self._span_trades[0][0] < scrape_time:
+            self._evict_span_trade()
+        if not self._trades_per_second:
+            return 0
+        return self._span_volume_sum / len(self._trades_per_second) / PRICE_SCALE
+
+    def _evict_span_trade(self):
+        _, second, volume = self._span_trades.popleft()
+        trades_count = self._trades_per_second[second] - 1
+        if trades_count:
+            self._trades_per_second[second] = trades_count
+        else:
+            del self._trades_per_second[second]
+        self._span_volume_sum -= volume
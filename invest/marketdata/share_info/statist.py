@@ -1,6 +1,7 @@
 from _decimal import Decimal
 from collections import deque
-from statistics import mean
+from datetime import datetime
+from statistics import StatisticsError, mean
 
 from tinkoff.invest import Candle, Trade
 from tinkoff.invest.utils import quotation_to_decimal, now
@@ -9,6 +10,12 @@ from invest.marketdata.settings import MarketDataSnifferSettings
 
 
 class ShareInfoStatist:
+    """Rolling share statistics kept as running accumulators.
+
+    Sums are updated on every observation and corrected on eviction, so the
+    read properties used in the sniffer hot loop are O(1).
+    """
+
     def __init__(self, marked_data_sniffer_settings: MarketDataSnifferSettings):
         self._settings = marked_data_sniffer_settings
 
@@ -20,6 +27,15 @@ class ShareInfoStatist:
         )
         self.last_trades: deque[Trade] = deque(maxlen=self._settings.last_trades_count)
 
+        self._candle_means_sum = Decimal(0)
+        self._trades_quantity_sum = 0
+
+        # trades still inside the scrape span, as (time, second, volume) in arrival order
+        self._span_trades: deque[tuple[datetime, datetime, Decimal]] = deque()
+        # second -> trades count for trades inside the scrape span
+        self._trades_per_second: dict[datetime, int] = {}
+        self._span_volume_sum = Decimal(0)
+
     def observe_candle_mean(self, candle: Candle) -> Decimal:
         self.last_candles.append(candle)
         candle_mean = mean(
@@ -28,38 +44,60 @@ class ShareInfoStatist:
                 (candle.open, candle.close, candle.high, candle.low),
             )
         )
+        if len(self.last_candle_means) == self.last_candle_means.maxlen:
+            self._candle_means_sum -= self.last_candle_means[0]
         self.last_candle_means.append(candle_mean)
+        self._candle_means_sum += candle_mean
         return candle_mean
 
+    @property
+    def last_candle_time(self) -> datetime | None:
+        if not self.last_candles:
+            return None
+        return self.last_candles[-1].time
+
     @property
     def last_candles_mean(self) -> Decimal:
-        return mean(self.last_candle_means)
+        if not self.last_candle_means:
+            raise StatisticsError("mean requires at least one data point")
+        return self._candle_means_sum / len(self.last_candle_means)
 
     def observe_trade(self, trade: Trade):
+        if len(self.last_trades) == self.last_trades.maxlen:
+            self._trades_quantity_sum -= self.last_trades[0].quantity
+            if len(self._span_trades) == len(self.last_trades):
+                self._evict_span_trade()
         self.last_trades.append(trade)
+        self._trades_quantity_sum += trade.quantity
+
+        second = trade.time.replace(microsecond=0)
+        volume = quotation_to_decimal(trade.price) * trade.quantity
+        self._span_trades.append((trade.time, second, volume))
+        self._trades_per_second[second] = self._trades_per_second.get(second, 0) + 1
+        self._span_volume_sum += volume
 
     @property
     def last_trades_mean_volume(self) -> float:
-        return mean([trade.quantity for trade in self.last_trades])
+        if not self.last_trades:
+            raise StatisticsError("mean requires at least one data point")
+        return self._trades_quantity_sum / len(self.last_trades)
 
     @property
     def last_trades_mean_volume_per_second(self) -> float:
         if not self.last_trades:
             return 0
-        last_trades_in_second = {}
         scrape_time = now() - self._settings.last_trades_scrape_span
-        for trade in self.last_trades:
-            if trade.time < scrape_time:
-                continue
-            rounded = trade.time.replace(microsecond=0)
-            last_trades = last_trades_in_second.get(rounded, [])
-            last_trades.append(trade)
-            last_trades_in_second[rounded] = last_trades
-
-        volumes = list(
-            sum(quotation_to_decimal(trade.price) * trade.quantity for trade in trades)
-            for trades in last_trades_in_second.values()
-        )
-        if not volumes:
+        while self._span_trades and self._span_trades[0][0] < scrape_time:
+            self._evict_span_trade()
+        if not self._trades_per_second:
             return 0
-        return mean(volumes)
+        return self._span_volume_sum / len(self._trades_per_second)
+
+    def _evict_span_trade(self):
+        _, second, volume = self._span_trades.popleft()
+        trades_count = self._trades_per_second[second] - 1
+        if trades_count:
+            self._trades_per_second[second] = trades_count
+        else:
+            del self._trades_per_second[second]
+        self._span_volume_sum -= volume
@@ -1,10 +1,28 @@
-from invest.marketdata.settings import MarketDataSnifferSettings
+from invest.marketdata.settings import MarketDataSnifferSettings, StatistBackend
+from invest.marketdata.share_info.columnar_statist import ColumnarShareInfoStatist
+from invest.marketdata.share_info.fixed_point_statist import (
+    FixedPointShareInfoStatist,
+)
 from invest.marketdata.share_info.statist import ShareInfoStatist
+from invest.marketdata.share_info.store import ShareStatsStore
 
 
 class ShareInfoStatistFactory:
-    def __init__(self, market_data_sniffer_settings: MarketDataSnifferSettings):
+    def __init__(
+        self,
+        market_data_sniffer_settings: MarketDataSnifferSettings,
+        share_stats_store: ShareStatsStore,
+    ):
         self._settings = market_data_sniffer_settings
+        self._share_stats_store = share_stats_store
 
-    def create(self):
+    def create(
+        self, instrument_uid: str
+    ) -> ShareInfoStatist | ColumnarShareInfoStatist | FixedPointShareInfoStatist:
+        if self._settings.statist_backend == StatistBackend.columnar:
+            return ColumnarShareInfoStatist(
+                self._share_stats_store, self._share_stats_store.slot(instrument_uid)
+            )
+        if self._settings.statist_backend == StatistBackend.fixed_point:
+            return FixedPointShareInfoStatist(self._settings)
         return ShareInfoStatist(self._settings)
@@ -0,0 +1,199 @@
+from _decimal import Decimal
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from tinkoff.invest import Candle, Quotation, Trade
+from tinkoff.invest.utils import now
+
+from invest.marketdata.settings import MarketDataSnifferSettings
+
+PRICE_SCALE = 1_000_000_000
+NANOSECONDS_IN_SECOND = 1_000_000_000
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def quotation_to_scaled(quotation: Quotation) -> int:
+    return quotation.units * PRICE_SCALE + quotation.nano
+
+
+class ShareStatsStore:
+    """Columnar ring buffers with rolling statistics for all watched shares.
+
+    Every instrument owns a slot (row) in the arrays. Prices are kept as int64
+    scaled by ``PRICE_SCALE`` and times as int64 nanoseconds since epoch, so
+    per-instrument updates are a handful of scalar writes and cross-instrument
+    statistics are computed in one vectorized pass.
+    """
+
+    def __init__(self, market_data_sniffer_settings: MarketDataSnifferSettings):
+        self._settings = market_data_sniffer_settings
+        self._candles_count = self._settings.last_candles_count
+        self._trades_count = self._settings.last_trades_count
+
+        self._slots: dict[str, int] = {}
+        self._allocate(self._settings.columnar_store_capacity)
+
+    def _allocate(self, capacity: int):
+        self.capacity = capacity
+        self.ohlc = np.zeros((capacity, self._candles_count, 4), dtype=np.int64)
+        self.candle_time = np.zeros((capacity, self._candles_count), dtype=np.int64)
+        self.candle_head = np.zeros(capacity, dtype=np.int64)
+        self.candle_count = np.zeros(capacity, dtype=np.int64)
+        # sum of open + high + low + close over the window, scaled
+        self.candle_sum = np.zeros(capacity, dtype=np.int64)
+
+        self.trade_time = np.zeros((capacity, self._trades_count), dtype=np.int64)
+        self.trade_price = np.zeros((capacity, self._trades_count), dtype=np.int64)
+        self.trade_quantity = np.zeros((capacity, self._trades_count), dtype=np.int64)
+        self.trade_head = np.zeros(capacity, dtype=np.int64)
+        self.trade_count = np.zeros(capacity, dtype=np.int64)
+        self.trade_quantity_sum = np.zeros(capacity, dtype=np.int64)
+
+        self.last_price = np.zeros(capacity, dtype=np.int64)
+        self.last_price_updated = np.zeros(capacity, dtype=bool)
+
+    def _grow(self):
+        old = {
+            name: value
+            for name, value in vars(self).items()
+            if isinstance(value, np.ndarray)
+        }
+        self._allocate(self.capacity * 2)
+        for name, value in old.items():
+            getattr(self, name)[: len(value)] = value
+
+    @property
+    def slots(self) -> dict[str, int]:
+        return self._slots
+
+    def slot(self, instrument_uid: str) -> int:
+        """Returns a cleared slot for the instrument, reusing a known one."""
+        slot = self._slots.get(instrument_uid)
+        if slot is None:
+            slot = len(self._slots)
+            if slot == self.capacity:
+                self._grow()
+            self._slots[instrument_uid] = slot
+        self.reset(slot)
+        return slot
+
+    def reset(self, slot: int):
+        self.candle_head[slot] = 0
+        self.candle_count[slot] = 0
+        self.candle_sum[slot] = 0
+        self.trade_head[slot] = 0
+        self.trade_count[slot] = 0
+        self.trade_quantity_sum[slot] = 0
+        self.last_price[slot] = 0
+        self.last_price_updated[slot] = False
+
+    def observe_candle(self, slot: int, candle: Candle) -> int:
+        """Stores the candle and returns the scaled sum of its OHLC."""
+        row = (
+            quotation_to_scaled(candle.open),
+            quotation_to_scaled(candle.high),
+            quotation_to_scaled(candle.low),
+            quotation_to_scaled(candle.close),
+        )
+        head = self.candle_head[slot]
+        if self.candle_count[slot] == self._candles_count:
+            self.candle_sum[slot] -= self.ohlc[slot, head].sum()
+        else:
+            self.candle_count[slot] += 1
+        self.ohlc[slot, head] = row
+        self.candle_time[slot, head] = _datetime_to_ns(candle.time)
+        self.candle_head[slot] = (head + 1) % self._candles_count
+        row_sum = sum(row)
+        self.candle_sum[slot] += row_sum
+        return row_sum
+
+    def observe_trade(self, slot: int, trade: Trade):
+        head = self.trade_head[slot]
+        if self.trade_count[slot] == self._trades_count:
+            self.trade_quantity_sum[slot] -= self.trade_quantity[slot, head]
+        else:
+            self.trade_count[slot] += 1
+        self.trade_time[slot, head] = _datetime_to_ns(trade.time)
+        self.trade_price[slot, head] = quotation_to_scaled(trade.price)
+        self.trade_quantity[slot, head] = trade.quantity
+        self.trade_head[slot] = (head + 1) % self._trades_count
+        self.trade_quantity_sum[slot] += trade.quantity
+
+    def observe_last_price(self, slot: int, price: Quotation):
+        self.last_price[slot] = quotation_to_scaled(price)
+        self.last_price_updated[slot] = True
+
+    def last_candle_time(self, slot: int) -> datetime | None:
+        if not self.candle_count[slot]:
+            return None
+        head = (self.candle_head[slot] - 1) % self._candles_count
+        return _ns_to_datetime(int(self.candle_time[slot, head]))
+
+    def candles_mean(self, slot: int) -> Decimal:
+        count = int(self.candle_count[slot])
+        return Decimal(int(self.candle_sum[slot])) / (4 * count * PRICE_SCALE)
+
+    def trades_mean_quantity(self, slot: int) -> float:
+        return int(self.trade_quantity_sum[slot]) / int(self.trade_count[slot])
+
+    def volumes_per_second(self, slots: slice | int = slice(None)) -> np.ndarray:
+        """Mean traded volume per second inside the scrape span for each slot."""
+        slots = slice(slots, slots + 1) if isinstance(slots, int) else slots
+        used = slice(0, len(self._slots))
+        scrape_time = _datetime_to_ns(now() - self._settings.last_trades_scrape_span)
+
+        trade_time = self.trade_time[used][slots]
+        filled = (
+            np.arange(self._trades_count)[None, :]
+            < self.trade_count[used][slots][:, None]
+        )
+        in_span = filled & (trade_time >= scrape_time)
+
+        volumes = np.where(
+            in_span,
+            self.trade_price[used][slots]
+            / PRICE_SCALE
+            * self.trade_quantity[used][slots],
+            0.0,
+        ).sum(axis=1)
+
+        seconds = np.where(in_span, trade_time // NANOSECONDS_IN_SECOND, -1)
+        seconds.sort(axis=1)
+        is_new_second = np.ones_like(in_span)
+        is_new_second[:, 1:] = seconds[:, 1:] != seconds[:, :-1]
+        seconds_count = ((seconds >= 0) & is_new_second).sum(axis=1)
+
+        return np.divide(
+            volumes,
+            seconds_count,
+            out=np.zeros_like(volumes),
+            where=seconds_count > 0,
+        )
+
+    def change_percents(self) -> np.ndarray:
+        """Last price change against the candles mean for each slot, NaN if unknown."""
+        used = slice(0, len(self._slots))
+        candle_count = self.candle_count[used]
+        means = np.divide(
+            self.candle_sum[used].astype(np.float64),
+            4 * candle_count,
+            out=np.full(len(candle_count), np.nan),
+            where=candle_count > 0,
+        )
+        last_price = np.where(self.last_price[used] > 0, self.last_price[used], np.nan)
+        return (last_price - means) / means * 100
+
+    def pop_updated_prices(self) -> np.ndarray:
+        """Returns a mask of slots with a new last price since the previous call."""
+        used = slice(0, len(self._slots))
+        updated = self.last_price_updated[used].copy()
+        self.last_price_updated[used] = False
+        return updated
+
+
+def _datetime_to_ns(value: datetime) -> int:
+    return (value - EPOCH) // timedelta(microseconds=1) * 1000
+
+
+def _ns_to_datetime(value: int) -> datetime:
+    return EPOCH + timedelta(microseconds=value // 1000)
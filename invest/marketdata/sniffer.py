@@ -1,10 +1,12 @@
 import asyncio
-from datetime import timedelta
+import random
+import time
 from threading import Event
+from typing import Awaitable, Callable, Iterable, TypeVar
 
+import numpy as np
 from dotenv import load_dotenv
 from tinkoff.invest import (
-    InstrumentType,
     MarketDataRequest,
     SubscribeCandlesRequest,
     SubscriptionAction,
@@ -15,18 +17,29 @@ from tinkoff.invest import (
     TradeInstrument,
     TradeDirection,
     Candle,
-    AsyncClient,
     InstrumentIdType,
+    Share,
 )
 from tinkoff.invest.async_services import AsyncServices
 from tinkoff.invest.utils import quotation_to_decimal, now
 
-from invest.invest_settings import InvestSettings
+from invest.client_provider import BrokerClientProvider
+from invest.instrument_cache import InstrumentCache
+from invest.marketdata.alert_dispatcher import AlertDispatcher
+from invest.marketdata.favorites import get_favorite_uids
 from invest.marketdata.notifier import MarketDataNotifier
-from invest.marketdata.settings import MarketDataSnifferSettings
+from invest.marketdata.settings import MarketDataSnifferSettings, StatistBackend
 from invest.marketdata.share_info.container import ShareInfoContainer
 from invest.marketdata.share_info.info import ShareInfo
 from invest.marketdata.share_info.statist_factory import ShareInfoStatistFactory
+from invest.marketdata.share_info.store import (
+    PRICE_SCALE,
+    ShareStatsStore,
+    quotation_to_scaled,
+)
+
+T = TypeVar("T")
+CandleListener = Callable[[Share, Candle], None]
 
 trade_direction_to_symbol = {
     TradeDirection.TRADE_DIRECTION_BUY: "🟢",
@@ -38,25 +51,48 @@ trade_direction_to_symbol = {
 class MarketDataSniffer:
     def __init__(
         self,
-        invest_settings: InvestSettings,
+        broker_client_provider: BrokerClientProvider,
         market_data_sniffer_settings: MarketDataSnifferSettings,
         share_info_statist_factory: ShareInfoStatistFactory,
         market_data_notifier: MarketDataNotifier,
+        share_stats_store: ShareStatsStore,
+        alert_dispatcher: AlertDispatcher,
+        instrument_cache: InstrumentCache,
     ):
-        self._invest_settings = invest_settings
+        self._broker_client_provider = broker_client_provider
         self._settings = market_data_sniffer_settings
         self._share_info_statist_factory = share_info_statist_factory
         self._market_data_notifier = market_data_notifier
+        self._share_stats_store = share_stats_store
+        self._alert_dispatcher = alert_dispatcher
+        self._instrument_cache = instrument_cache
+        self._is_columnar = self._settings.statist_backend == StatistBackend.columnar
+        self._is_fixed_point = (
+            self._settings.statist_backend == StatistBackend.fixed_point
+        )
 
         self._share_info_containers: dict[str, ShareInfoContainer] = {}
+        self._stream_received_data = False
+        self._candle_listeners: list[CandleListener] = []
+        self.messages_received = 0
+        # uids given by the shard coordinator, favorites are resolved otherwise
+        self.watched_uids: list[str] | None = None
 
         self._is_running = Event()
 
     def stop(self):
         self._is_running.clear()
 
+    def add_candle_listener(self, listener: CandleListener):
+        """Listener is called in the stream loop for every observed candle,
+        historic ones included, so it must not block."""
+        self._candle_listeners.append(listener)
+
     async def run(self):
         self._is_running.set()
+        self._alert_dispatcher.start()
+        monitor = asyncio.create_task(self._run_volume_per_second_monitor())
+        errors_in_row = 0
         try:
             while self._is_running.is_set():
                 try:
@@ -64,42 +100,62 @@ class MarketDataSniffer:
                 except Exception as e:
                     print("exception", e)
                     await self._market_data_notifier.notify_error(e)
-                    await asyncio.sleep(self._settings.on_error_sleep.total_seconds())
+                    errors_in_row = 0 if self._stream_received_data else errors_in_row
+                    errors_in_row += 1
+                    await asyncio.sleep(self._reconnect_delay(errors_in_row))
         except BaseException as e:
             self.stop()
             await self._market_data_notifier.notify_error(e)
             raise e
+        finally:
+            monitor.cancel()
+            await asyncio.gather(monitor, return_exceptions=True)
+            await self._alert_dispatcher.stop()
+
+    def _reconnect_delay(self, errors_in_row: int) -> float:
+        """Jittered exponential backoff, the first reconnect is almost immediate."""
+        delay = min(
+            self._settings.on_error_min_sleep.total_seconds()
+            * 2 ** (errors_in_row - 1),
+            self._settings.on_error_sleep.total_seconds(),
+        )
+        return random.uniform(delay / 2, delay)
 
     async def _run(self):
-        async with AsyncClient(self._invest_settings.token) as client:
-            s = await client.instruments.get_favorites()
-            share_to_watch = []
-            for i in s.favorite_instruments:
-                if (
-                    i.api_trade_available_flag
-                    and i.instrument_kind == InstrumentType.INSTRUMENT_TYPE_SHARE
-                ):
-                    share_response = await client.instruments.share_by(
-                        id_type=InstrumentIdType.INSTRUMENT_ID_TYPE_UID,
-                        id=i.uid,
-                    )
-                    share_to_watch.append(share_response.instrument)
+        self._stream_received_data = False
+        async with self._broker_client_provider.client() as client:
+            startup_started_at = time.perf_counter()
+            share_to_watch = await self._get_shares_to_watch(client)
+            shares_resolved_at = time.perf_counter()
 
+            # statistics of already watched shares stay warm across reconnects
+            previous_containers = self._share_info_containers
             self._share_info_containers = {
-                share.uid: ShareInfoContainer(
+                share.uid: previous_containers.get(share.uid)
+                or ShareInfoContainer(
                     share_info=ShareInfo(share=share),
-                    share_info_statist=self._share_info_statist_factory.create(),
+                    share_info_statist=self._share_info_statist_factory.create(
+                        share.uid
+                    ),
                 )
                 for share in share_to_watch
             }
 
             await self._init_historic_candles(client)
-            asyncio.create_task(self._run_volume_per_second_monitor())
-
-            await self._market_data_notifier.notify_about_start(
-                share_info_containers=self._share_info_containers
+            candles_loaded_at = time.perf_counter()
+            print(
+                "sniffer startup:",
+                f"{len(share_to_watch)} shares resolved in"
+                f" {shares_resolved_at - startup_started_at:.2f}s,",
+                f"candles loaded in {candles_loaded_at - shares_resolved_at:.2f}s,",
+                f"total {candles_loaded_at - startup_started_at:.2f}s",
             )
 
+            if self._share_info_containers.keys() - previous_containers.keys():
+                await self._market_data_notifier.notify_about_start(
+                    share_info_containers=self._share_info_containers
+                )
+
             requests = [
                 MarketDataRequest(
                     subscribe_candles_request=SubscribeCandlesRequest(
@@ -148,6 +204,8 @@ class MarketDataSniffer:
                 async for marketdata in client.market_data_stream.market_data_stream(
                     request_iterator()
                 ):
+                    self._stream_received_data = True
+                    self.messages_received += 1
                     candle = marketdata.candle
                     last_price = marketdata.last_price
                     trade = marketdata.trade
@@ -161,12 +219,24 @@ class MarketDataSniffer:
 
                     if candle:
                         candle_mean = share_info_statist.observe_candle_mean(candle)
+                        self._notify_candle(share, candle)
                         # print(
                         #     'candle', share_info.name, candle_mean,
                         #     share_info.last_candles_mean
                         # )
 
-                    if last_price:
+                    if last_price and self._is_columnar:
+                        # threshold is checked for all shares at once by the monitor
+                        share_info_statist.observe_last_price(last_price.price)
+                    elif last_price and self._is_fixed_point:
+                        if share_info_statist.is_high_change(last_price.price):
+                            self._alert_dispatcher.submit(
+                                share=share,
+                                change_percent=share_info_statist.change_percent(
+                                    last_price.price
+                                ),
+                            )
+                    elif last_price:
                         last_candles_mean = share_info_statist.last_candles_mean
                         change_percent = (
                             (quotation_to_decimal(last_price.price) - last_candles_mean)
@@ -177,13 +247,23 @@ class MarketDataSniffer:
                             abs(change_percent)
                             > self._settings.change_percent_threshold
                         ):
-                            await self._market_data_notifier.notify_high_change(
-                                change_percent=change_percent, share=share
+                            self._alert_dispatcher.submit(
+                                share=share, change_percent=change_percent
                             )
                     if trade:
                         share_info_statist.observe_trade(trade)
+                        if self._is_fixed_point:
+                            trade_volume = (
+                                quotation_to_scaled(trade.price)
+                                * trade.quantity
+                                / PRICE_SCALE
+                            )
+                        else:
+                            trade_volume = (
+                                quotation_to_decimal(trade.price) * trade.quantity
+                            )
                         if (
-                            quotation_to_decimal(trade.price) * trade.quantity
+                            trade_volume
                             > share_info_statist.last_trades_mean_volume_per_second
                         ):
                             # print(
@@ -197,25 +277,105 @@ class MarketDataSniffer:
                             pass
 
     async def _run_volume_per_second_monitor(self):
+        errors_in_row = 0
         while self._is_running.is_set():
-            vpss = {}
-            for container in self._share_info_containers.values():
-                vps = container.share_info_statist.last_trades_mean_volume_per_second
-                if vps > 0:
-                    vpss[container.share_info.share] = vps
+            try:
+                if self._is_columnar:
+                    vpss = self._check_columnar_store()
+                else:
+                    vpss = {}
+                    for container in self._share_info_containers.values():
+                        statist = container.share_info_statist
+                        vps = statist.last_trades_mean_volume_per_second
+                        if vps > 0:
+                            vpss[container.share_info.share] = vps
+                errors_in_row = 0
+            except Exception as e:
+                # the monitor keeps running, a failing streak is reported once
+                errors_in_row += 1
+                if errors_in_row == 1:
+                    print("volume per second monitor exception", e)
+                    await self._market_data_notifier.notify_error(e)
             # for share, vps in sorted(vpss.items(), key=lambda p: p[0].name, reverse=True):
             #     print("volume per second", share.name, vps)
-            await asyncio.sleep(1)
+            await asyncio.sleep(self._settings.monitor_interval.total_seconds())
+
+    def _check_columnar_store(self) -> dict[Share, float]:
+        shares = [
+            self._share_info_containers[uid].share_info.share
+            if uid in self._share_info_containers
+            else None
+            for uid in self._share_stats_store.slots
+        ]
+        vpss = {}
+        for share, vps in zip(shares, self._share_stats_store.volumes_per_second()):
+            if share is not None and vps > 0:
+                vpss[share] = float(vps)
+
+        change_percents = self._share_stats_store.change_percents()
+        high_change = self._share_stats_store.pop_updated_prices() & (
+            np.abs(change_percents) > self._settings.change_percent_threshold
+        )
+        for slot in np.flatnonzero(high_change):
+            if shares[slot] is not None:
+                self._alert_dispatcher.submit(
+                    share=shares[slot], change_percent=float(change_percents[slot])
+                )
+        return vpss
+
+    async def _get_shares_to_watch(self, client: AsyncServices) -> list[Share]:
+        favorite_uids = self.watched_uids
+        if favorite_uids is None:
+            favorite_uids = await self._with_timeout(
+                get_favorite_uids(client, self._instrument_cache)
+            )
+
+        shares = {uid: self._instrument_cache.get_share(uid) for uid in favorite_uids}
+        share_responses = await self._gather_limited(
+            client.instruments.share_by(
+                id_type=InstrumentIdType.INSTRUMENT_ID_TYPE_UID,
+                id=uid,
+            )
+            for uid, share in shares.items()
+            if share is None
+        )
+        for share_response in share_responses:
+            self._instrument_cache.put_share(share_response.instrument)
+            shares[share_response.instrument.uid] = share_response.instrument
+        return [shares[uid] for uid in favorite_uids]
 
     async def _init_historic_candles(self, client: AsyncServices):
+        """Loads candles missed since the last observed one, or the whole window."""
+        requested_at = now()
+        candle_step = self._settings.candle_step
+        window_start = requested_at - candle_step * self._settings.last_candles_count
+        gaps = []
         for container in self._share_info_containers.values():
-            response = await client.market_data.get_candles(
+            last_candle_time = container.share_info_statist.last_candle_time
+            if last_candle_time is None:
+                gaps.append((container, window_start))
+                continue
+            next_candle_time = last_candle_time + candle_step
+            if next_candle_time < requested_at:
+                gaps.append((container, max(window_start, next_candle_time)))
+
+        responses = await self._gather_limited(
+            client.market_data.get_candles(
                 instrument_id=container.share_info.share.uid,
-                from_=now() - timedelta(minutes=self._settings.last_candles_count),
-                to=now(),
+                from_=gap_start,
+                to=requested_at,
                 interval=self._settings.interval,
             )
+            for container, gap_start in gaps
+        )
+        for (container, _), response in zip(gaps, responses):
+            last_candle_time = container.share_info_statist.last_candle_time
             for historic_candle in response.candles:
+                if (
+                    last_candle_time is not None
+                    and historic_candle.time <= last_candle_time
+                ):
+                    continue
                 candle = Candle(
                     figi=container.share_info.share.figi,
                     interval=self._settings.interval,
@@ -229,6 +389,28 @@ class MarketDataSniffer:
                     instrument_uid=container.share_info.share.uid,
                 )
                 container.share_info_statist.observe_candle_mean(candle)
+                self._notify_candle(container.share_info.share, candle)
+
+    def _notify_candle(self, share: Share, candle: Candle):
+        for listener in self._candle_listeners:
+            try:
+                listener(share, candle)
+            except Exception as e:
+                print("candle listener exception", e)
+
+    async def _gather_limited(self, calls: Iterable[Awaitable[T]]) -> list[T]:
+        semaphore = asyncio.Semaphore(self._settings.startup_concurrency)
+
+        async def limited(call: Awaitable[T]) -> T:
+            async with semaphore:
+                return await self._with_timeout(call)
+
+        return await asyncio.gather(*(limited(call) for call in calls))
+
+    async def _with_timeout(self, call: Awaitable[T]) -> T:
+        return await asyncio.wait_for(
+            call, self._settings.startup_call_timeout.total_seconds()
+        )
 
 
 if __name__ == "__main__":
@@ -236,6 +418,5 @@ if __name__ == "__main__":
 
     from deps import get_container
 
-    print(get_container().__dict__)
     sniffer = get_container().resolve(MarketDataSniffer)
-    sniffer.run()
+    asyncio.run(sniffer.run())
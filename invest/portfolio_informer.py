@@ -1,11 +1,11 @@
 from decimal import Decimal
 
 from pydantic import BaseModel
-from tinkoff.invest import Quotation, AsyncClient
+from tinkoff.invest import Quotation
 from tinkoff.invest.async_services import AsyncServices
 from tinkoff.invest.utils import money_to_decimal
 
-from invest.invest_settings import InvestSettings
+from invest.client_provider import BrokerClientProvider
 
 
 class PortfolioInfo(BaseModel):
@@ -15,12 +15,12 @@ class PortfolioInfo(BaseModel):
 
 
 class PortfolioInformer:
-    def __init__(self, invest_settings: InvestSettings):
-        self._invest_settings = invest_settings
+    def __init__(self, broker_client_provider: BrokerClientProvider):
+        self._broker_client_provider = broker_client_provider
         self._account_id: str | None = None
 
     async def get_info(self) -> PortfolioInfo:
-        async with AsyncClient(self._invest_settings.token) as client:
+        async with self._broker_client_provider.client() as client:
             main_account = await self._get_account_id(client)
 
             portfolio = await client.operations.get_portfolio(account_id=main_account)
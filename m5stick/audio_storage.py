@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import os
+import struct
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO
+
+from m5stick.settings import AudioSettings
+
+logger = logging.getLogger(__name__)
+
+WAV_HEADER_SIZE = 44
+
+
+def wav_header(data_size: int, sample_rate: int, bits: int, channels: int) -> bytes:
+    byte_rate = sample_rate * channels * (bits // 8)
+    block_align = channels * (bits // 8)
+    return (
+        b"RIFF"
+        + struct.pack("<I", 36 + data_size)
+        + b"WAVE"
+        + b"fmt "
+        + struct.pack(
+            "<IHHIIHH", 16, 1, channels, sample_rate, byte_rate, block_align, bits
+        )
+        + b"data"
+        + struct.pack("<I", data_size)
+    )
+
+
+class AudioWriter:
+    """Writes a file chunk by chunk in a worker thread, off the event loop."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._file: BinaryIO | None = None
+
+    async def write(self, chunk: bytes):
+        if self._file is None:
+            self._file = await asyncio.to_thread(open, self.path, "xb")
+        await asyncio.to_thread(self._file.write, chunk)
+
+    async def rewrite(self, offset: int, chunk: bytes):
+        await asyncio.to_thread(self._rewrite, offset, chunk)
+
+    def _rewrite(self, offset: int, chunk: bytes):
+        position = self._file.tell()
+        self._file.seek(offset)
+        self._file.write(chunk)
+        self._file.seek(position)
+
+    async def close(self):
+        if self._file is not None:
+            await asyncio.to_thread(self._file.close)
+
+
+class AudioStorage:
+    def __init__(self, audio_settings: AudioSettings):
+        self._settings = audio_settings
+        self._upload_dir = Path(self._settings.upload_dir)
+
+    def new_recording_id(self) -> str:
+        """Unique id shared by the files of one voice request."""
+        timestamp = datetime.now().strftime(self._settings.timestamp_format)
+        return f"{timestamp}_{uuid.uuid4().hex[:8]}"
+
+    def open_writer(self, prefix: str, recording_id: str) -> AudioWriter:
+        self._upload_dir.mkdir(parents=True, exist_ok=True)
+        return AudioWriter(self._upload_dir / f"{prefix}_{recording_id}.wav")
+
+    async def save_stream(
+        self, chunks: AsyncIterator[bytes], prefix: str, recording_id: str
+    ) -> tuple[Path, bytes]:
+        """Streams chunks to disk as they arrive and returns the path and data."""
+        writer = self.open_writer(prefix, recording_id)
+        data = bytearray()
+        try:
+            async for chunk in chunks:
+                if chunk:
+                    data.extend(chunk)
+                    await writer.write(chunk)
+        finally:
+            await writer.close()
+        return writer.path, bytes(data)
+
+    async def save_pcm_stream(
+        self,
+        chunks: AsyncIterator[bytes],
+        prefix: str,
+        recording_id: str,
+        sample_rate: int,
+        bits: int,
+        channels: int,
+    ) -> tuple[Path, bytes]:
+        """Streams raw PCM of unknown length to disk as a WAV file.
+
+        The header is written with empty sizes and patched once the stream ends.
+        """
+        writer = self.open_writer(prefix, recording_id)
+        data = bytearray()
+        try:
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+                if not data:
+                    header = wav_header(0, sample_rate, bits, channels)
+                    data.extend(header)
+                    await writer.write(header)
+                data.extend(chunk)
+                await writer.write(chunk)
+            if data:
+                header = wav_header(
+                    len(data) - WAV_HEADER_SIZE, sample_rate, bits, channels
+                )
+                data[:WAV_HEADER_SIZE] = header
+                await writer.rewrite(0, header)
+        finally:
+            await writer.close()
+        return writer.path, bytes(data)
+
+    async def run_retention(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.prune)
+            except Exception as e:
+                logger.error(f"Audio retention failed: {str(e)}")
+            await asyncio.sleep(self._settings.retention_interval.total_seconds())
+
+    def prune(self):
+        if not self._upload_dir.is_dir():
+            return
+        files = []
+        for entry in os.scandir(self._upload_dir):
+            if entry.is_file():
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, Path(entry.path)))
+        files.sort()
+
+        expired_before = time.time() - self._settings.max_age.total_seconds()
+        total_size = sum(size for _, size, _ in files)
+        for modified_at, size, path in files:
+            if (
+                modified_at >= expired_before
+                and total_size <= self._settings.max_total_size
+            ):
+                break
+            path.unlink(missing_ok=True)
+            total_size -= size
+            logger.info(f"Audio pruned: {path}")
@@ -0,0 +1,95 @@
+import io
+import wave
+
+import numpy as np
+
+from m5stick.settings import AudioPreprocessingSettings
+
+INT16_FULL_SCALE = 32768
+
+
+class AudioPreprocessor:
+    """Trims silence around speech and shrinks 16-bit PCM WAVs before Whisper."""
+
+    def __init__(self, settings: AudioPreprocessingSettings):
+        self._settings = settings
+
+    def process(self, wav_bytes: bytes) -> bytes:
+        if not self._settings.enabled:
+            return wav_bytes
+        try:
+            samples, sample_rate = self.decode(wav_bytes)
+        except (wave.Error, EOFError, ValueError):
+            # not a 16-bit PCM WAV, let Whisper deal with it
+            return wav_bytes
+        trimmed = self.trim_silence(samples, sample_rate)
+        if not len(trimmed):
+            return wav_bytes
+        resampled, sample_rate = self.resample(trimmed, sample_rate)
+        return self.encode(resampled, sample_rate)
+
+    def decode(self, wav_bytes: bytes) -> tuple[np.ndarray, int]:
+        """Returns int16 samples shaped (frames, channels) and the sample rate."""
+        with wave.open(io.BytesIO(wav_bytes)) as wav:
+            if wav.getsampwidth() != 2:
+                raise ValueError("only 16-bit PCM is supported")
+            channels = wav.getnchannels()
+            sample_rate = wav.getframerate()
+            frames = wav.readframes(wav.getnframes())
+        samples = np.frombuffer(frames, dtype="<i2")
+        samples = samples[: len(samples) - len(samples) % channels]
+        return samples.reshape(-1, channels), sample_rate
+
+    def trim_silence(self, samples: np.ndarray, sample_rate: int) -> np.ndarray:
+        frame_size = max(1, sample_rate * self._settings.vad_frame_ms // 1000)
+        frames_count = len(samples) // frame_size
+        if not frames_count:
+            return samples
+
+        frames = (
+            samples[: frames_count * frame_size].astype(np.float32) / INT16_FULL_SCALE
+        ).reshape(frames_count, -1)
+        rms = np.sqrt(np.mean(frames**2, axis=1))
+        dbfs = 20 * np.log10(np.maximum(rms, 1e-10))
+        voiced = np.flatnonzero(dbfs > self._settings.vad_threshold_dbfs)
+        if not len(voiced):
+            return samples[:0]
+
+        padding = sample_rate * self._settings.vad_padding_ms // 1000
+        start = max(0, voiced[0] * frame_size - padding)
+        end = min(len(samples), (voiced[-1] + 1) * frame_size + padding)
+        return samples[start:end]
+
+    def resample(self, samples: np.ndarray, sample_rate: int) -> tuple[np.ndarray, int]:
+        if self._settings.downmix and samples.shape[1] > 1:
+            samples = samples.mean(axis=1, keepdims=True).astype(np.int16)
+
+        target_sample_rate = self._settings.target_sample_rate
+        if not target_sample_rate or target_sample_rate >= sample_rate:
+            return samples, sample_rate
+
+        # box filter against aliasing, then linear interpolation
+        ratio = sample_rate / target_sample_rate
+        window = max(1, round(ratio))
+        kernel = np.ones(window, dtype=np.float32) / window
+        source_time = np.arange(len(samples))
+        target_time = np.arange(int(len(samples) / ratio)) * ratio
+        channels = [
+            np.interp(
+                target_time,
+                source_time,
+                np.convolve(samples[:, channel], kernel, mode="same"),
+            )
+            for channel in range(samples.shape[1])
+        ]
+        resampled = np.stack(channels, axis=1).round().astype(np.int16)
+        return resampled, target_sample_rate
+
+    def encode(self, samples: np.ndarray, sample_rate: int) -> bytes:
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav:
+            wav.setnchannels(samples.shape[1])
+            wav.setsampwidth(2)
+            wav.setframerate(sample_rate)
+            wav.writeframes(samples.astype("<i2").tobytes())
+        return buffer.getvalue()
@@ -0,0 +1,77 @@
+import dataclasses
+import hashlib
+import json
+import re
+import time
+from collections import OrderedDict
+
+from m5stick.settings import OpenAISettings, VoiceResponseCacheSettings
+
+
+@dataclasses.dataclass(frozen=True)
+class CachedVoiceResponse:
+    text: str
+    audio: bytes
+    created_at: float
+
+
+class VoiceResponseCache:
+    """LRU cache of chat replies and their synthesized audio by question."""
+
+    def __init__(
+        self, settings: VoiceResponseCacheSettings, openai_settings: OpenAISettings
+    ):
+        self._settings = settings
+        self._openai_settings = openai_settings
+        self._responses: OrderedDict[str, CachedVoiceResponse] = OrderedDict()
+        self._total_size = 0
+
+    def get(self, transcription: str) -> CachedVoiceResponse | None:
+        key = self._key(transcription)
+        response = self._responses.get(key)
+        if response is None:
+            return None
+        if time.monotonic() - response.created_at > self._settings.ttl.total_seconds():
+            self._remove(key)
+            return None
+        self._responses.move_to_end(key)
+        return response
+
+    def put(self, transcription: str, text: str, audio: bytes):
+        if len(audio) > self._settings.max_total_size:
+            return
+        key = self._key(transcription)
+        if key in self._responses:
+            self._remove(key)
+        self._responses[key] = CachedVoiceResponse(
+            text=text, audio=audio, created_at=time.monotonic()
+        )
+        self._total_size += len(audio)
+        while (
+            len(self._responses) > self._settings.max_entries
+            or self._total_size > self._settings.max_total_size
+        ):
+            self._remove(next(iter(self._responses)))
+
+    def _remove(self, key: str):
+        self._total_size -= len(self._responses.pop(key).audio)
+
+    def _key(self, transcription: str) -> str:
+        """Hash of the normalized question and of every setting shaping the answer."""
+        normalized = " ".join(re.findall(r"\w+", transcription.lower()))
+        settings = self._openai_settings
+        content = json.dumps(
+            [
+                normalized,
+                settings.chat_model,
+                settings.system_prompt,
+                settings.max_tokens,
+                settings.temperature,
+                settings.tts_model,
+                settings.tts_voice,
+                str(settings.tts_instructions),
+                settings.response_format,
+            ],
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(content.encode()).hexdigest()
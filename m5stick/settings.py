@@ -1,15 +1,19 @@
+from datetime import timedelta
+
 from openai import NOT_GIVEN, NotGiven
 from pydantic.v1 import BaseSettings
 
 
 class OpenAISettings(BaseSettings):
     api_key: str
+    base_url: str | None = None
     whisper_model: str = "whisper-1"
     chat_model: str = "gpt-4o-mini"
     tts_model: str = "gpt-4o-mini-tts"
     tts_instructions: str | NotGiven = 'Говори очень уверенным голосом, как профессиональный диктор.'
     tts_voice: str = "shimmer"
     response_format: str = "wav"
+    tts_chunk_size: int = 4096
     max_tokens: int = 500
     temperature: float = 0.7
     system_prompt: str = (
@@ -26,5 +30,33 @@ class AudioSettings(BaseSettings):
     tts_filename_prefix: str = "tts"
     timestamp_format: str = "%Y%m%d_%H%M%S"
 
+    # retention of upload_dir, oldest recordings are pruned first
+    retention_interval: timedelta = timedelta(hours=1)
+    max_age: timedelta = timedelta(days=7)
+    max_total_size: int = 500 * 1024 * 1024
+
     class Config:
         env_prefix = "AUDIO_"
+
+
+class VoiceResponseCacheSettings(BaseSettings):
+    max_entries: int = 128
+    max_total_size: int = 64 * 1024 * 1024
+    ttl: timedelta = timedelta(hours=1)
+
+    class Config:
+        env_prefix = "VOICE_RESPONSE_CACHE_"
+
+
+class AudioPreprocessingSettings(BaseSettings):
+    enabled: bool = True
+    # voice activity detection on frame energy
+    vad_frame_ms: int = 30
+    vad_threshold_dbfs: float = -45
+    vad_padding_ms: int = 200
+    downmix: bool = True
+    # None keeps the recorded sample rate
+    target_sample_rate: int | None = None
+
+    class Config:
+        env_prefix = "AUDIO_PREPROCESSING_"
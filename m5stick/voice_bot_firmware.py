@@ -14,6 +14,9 @@ label0 = None
 
 # ===== CONFIG =====
 UPLOAD_URL   = "http://192.168.1.121:8000/audio"
+# потоковая отправка: PCM уходит кусками прямо во время записи
+STREAM_UPLOAD = True
+STREAM_URL   = "http://192.168.1.121:8000/audio/pcm?sample_rate=16000&bits=16&channels=1"
 AUTH_TOKEN   = None
 REPLY_PATH   = "/flash/reply.wav"
 
@@ -39,6 +42,12 @@ _current_chunk = None
 _waiting_chunk = False
 wdt = None
 
+# два буфера по очереди: пока один пишется микрофоном, второй уходит в сокет
+_chunk_bufs = None
+_chunk_idx = 0
+_stream_sock = None
+_stream_err = None
+
 def _net_init_timeouts():
     # Глобальный таймаут для всех новых сокетов (работает внутри urequests)
     try:
@@ -150,21 +159,138 @@ def _post_wav_and_save_reply(wav_bytes, reply_path):
             pass
         gc.collect()
 
+def _split_url(url):
+    # "http://host:port/path?query" -> (host, port, "/path?query")
+    rest = url.split("://", 1)[1]
+    if "/" in rest:
+        hostport, path = rest.split("/", 1)
+        path = "/" + path
+    else:
+        hostport, path = rest, "/"
+    if ":" in hostport:
+        host, port = hostport.split(":", 1)
+        port = int(port)
+    else:
+        host, port = hostport, 80
+    return host, port, path
+
+def _stream_open():
+    """
+    Открывает POST с Transfer-Encoding: chunked; тело дописывается по мере записи.
+    HTTP/1.0 — чтобы ответ пришёл без chunked и читался до закрытия сокета.
+    """
+    host, port, path = _split_url(STREAM_URL)
+    addr = socket.getaddrinfo(host, port)[0][-1]
+    sock = socket.socket()
+    try:
+        sock.settimeout(HTTP_TIMEOUT_S)
+        sock.connect(addr)
+        req = "POST {} HTTP/1.0\r\nHost: {}\r\n".format(path, host)
+        req += "Content-Type: application/octet-stream\r\n"
+        req += "Transfer-Encoding: chunked\r\n"
+        if AUTH_TOKEN:
+            req += "Authorization: {}\r\n".format(AUTH_TOKEN)
+        sock.write(req.encode() + b"\r\n")
+    except:
+        sock.close()
+        raise
+    return sock
+
+def _stream_send_chunk(sock, data):
+    if BITS == 8:
+        # как в _wav_wrap: WAV хранит 8-бит беззнаковым
+        data = bytes(((b + 128) & 0xFF) for b in data)
+    sock.write(b"%x\r\n" % len(data))
+    sock.write(data)
+    sock.write(b"\r\n")
+
+def _stream_finish_and_save_reply(sock, reply_path):
+    """
+    Закрывает тело запроса и сохраняет ответ в файл, с теми же лимитами,
+    что и _post_wav_and_save_reply. Возвращает (ok, err_msg | None)
+    """
+    wrote = 0
+    try:
+        sock.write(b"0\r\n\r\n")
+
+        status_line = sock.readline()
+        parts = status_line.split(None, 2)
+        status = int(parts[1]) if len(parts) > 1 else 0
+        clen = None
+        while True:
+            line = sock.readline()
+            if not line or line == b"\r\n":
+                break
+            if line.lower().startswith(b"content-length:"):
+                clen = int(line.split(b":", 1)[1])
+
+        if status != 200:
+            err_txt = sock.read(128) or b""
+            return False, "HTTP {} {}".format(status, err_txt)
+        if clen is not None and clen > REPLY_MAX_BYTES:
+            return False, "Reply too big: {} bytes".format(clen)
+
+        with open(reply_path, "wb") as f:
+            while True:
+                _feed_wdt()
+                # «молчание» дольше HTTP_TIMEOUT_S прерывает чтение исключением
+                chunk = sock.read(REPLY_READ_CHUNK)
+                if not chunk:
+                    # HTTP/1.0: конец тела — сервер закрыл соединение
+                    break
+                f.write(chunk)
+                wrote += len(chunk)
+                if wrote > REPLY_MAX_BYTES:
+                    return False, "Reply exceeded {} bytes".format(REPLY_MAX_BYTES)
+
+        return True, None
+    except Exception as e:
+        return False, str(e)
+    finally:
+        try:
+            sock.close()
+        except:
+            pass
+        gc.collect()
+
 def _start_next_chunk():
-    global _current_chunk, _waiting_chunk
-    _current_chunk = bytearray(CHUNK_SAMPLES * BYTES_PER_SAMPLE)
+    global _current_chunk, _waiting_chunk, _chunk_idx
+    if STREAM_UPLOAD:
+        _current_chunk = _chunk_bufs[_chunk_idx]
+        _chunk_idx ^= 1
+    else:
+        _current_chunk = bytearray(CHUNK_SAMPLES * BYTES_PER_SAMPLE)
     Mic.record(_current_chunk, SR, False)
     _waiting_chunk = True
 
 def _poll_chunk_and_append():
     global _current_chunk, _waiting_chunk, pcm_buf
     if _waiting_chunk and not Mic.isRecording():
-        pcm_buf.extend(_current_chunk)
+        done_chunk = _current_chunk
         _current_chunk = None
         _waiting_chunk = False
+        if STREAM_UPLOAD:
+            # сразу запускаем следующий кусок во второй буфер, потом отправляем
+            if BtnA.isPressed():
+                _start_next_chunk()
+            _stream_chunk(done_chunk)
+        else:
+            pcm_buf.extend(done_chunk)
+
+def _stream_chunk(data):
+    global _stream_sock, _stream_err
+    if _stream_sock is None:
+        return
+    try:
+        _stream_send_chunk(_stream_sock, data)
+    except Exception as e:
+        _stream_err = str(e)
+        try: _stream_sock.close()
+        except: pass
+        _stream_sock = None
 
 def setup():
-    global label0
+    global label0, _chunk_bufs
     M5.begin()
     Widgets.setRotation(1)
     Widgets.fillScreen(0x222222)
@@ -172,9 +298,12 @@ def setup():
                            0xffffff, 0x222222, Widgets.FONTS.DejaVu18)
     _net_init_timeouts()
     _start_wdt()
+    if STREAM_UPLOAD:
+        _chunk_bufs = [bytearray(CHUNK_SAMPLES * BYTES_PER_SAMPLE),
+                       bytearray(CHUNK_SAMPLES * BYTES_PER_SAMPLE)]
 
 def loop():
-    global recording, pcm_buf
+    global recording, pcm_buf, _stream_sock, _stream_err
     M5.update()
     _feed_wdt()
 
@@ -188,6 +317,13 @@ def loop():
     if BtnA.wasPressed() and not recording:
         try: Speaker.end()
         except: pass
+        if STREAM_UPLOAD:
+            _stream_err = None
+            try:
+                _stream_sock = _stream_open()
+            except Exception as e:
+                _stream_sock = None
+                _stream_err = str(e)
         Mic.begin()
         pcm_buf = bytearray()
         recording = True
@@ -213,17 +349,26 @@ def loop():
             Mic.end()
             recording = False
 
-            # выравниваем 16-бит
-            if BITS == 16 and (len(pcm_buf) & 1):
-                pcm_buf[:] = pcm_buf[:-1]
+            if STREAM_UPLOAD:
+                # всё уже на сервере — закрываем тело и ждём ответ
+                label0.setText("POST…reply")
+                if _stream_sock is None:
+                    ok, err = False, _stream_err
+                else:
+                    ok, err = _stream_finish_and_save_reply(_stream_sock, REPLY_PATH)
+                    _stream_sock = None
+            else:
+                # выравниваем 16-бит
+                if BITS == 16 and (len(pcm_buf) & 1):
+                    pcm_buf[:] = pcm_buf[:-1]
 
-            label0.setText("wrap wav…")
-            wav_bytes = _wav_wrap(bytes(pcm_buf), SR, BITS, 1)
-            gc.collect()
+                label0.setText("wrap wav…")
+                wav_bytes = _wav_wrap(bytes(pcm_buf), SR, BITS, 1)
+                gc.collect()
 
-            # POST -> ответ сохраняем в файл (с таймаутами)
-            label0.setText("POST…reply")
-            ok, err = _post_wav_and_save_reply(wav_bytes, REPLY_PATH)
+                # POST -> ответ сохраняем в файл (с таймаутами)
+                label0.setText("POST…reply")
+                ok, err = _post_wav_and_save_reply(wav_bytes, REPLY_PATH)
             if not ok:
                 label0.setText("POST err")
                 print("POST/reply error:", err)
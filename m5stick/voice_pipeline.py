@@ -0,0 +1,73 @@
+import dataclasses
+import io
+import time
+from typing import AsyncIterator
+
+from openai import AsyncOpenAI
+
+from m5stick.settings import OpenAISettings
+
+
+@dataclasses.dataclass
+class VoicePipelineTimings:
+    started_at: float = dataclasses.field(default_factory=time.perf_counter)
+    preprocessing: float | None = None
+    transcription: float | None = None
+    chat: float | None = None
+    first_audio_byte: float | None = None
+    synthesis: float | None = None
+
+    def mark(self, stage: str):
+        setattr(self, stage, time.perf_counter() - self.started_at)
+
+    def __str__(self):
+        return ", ".join(
+            f"{field.name} {value:.3f}s"
+            for field in dataclasses.fields(self)
+            if field.name != "started_at"
+            and (value := getattr(self, field.name)) is not None
+        )
+
+
+class VoicePipeline:
+    """Whisper -> chat -> TTS on the async OpenAI client, TTS output is streamed."""
+
+    def __init__(self, openai_settings: OpenAISettings):
+        self._settings = openai_settings
+        self._client = AsyncOpenAI(
+            api_key=self._settings.api_key, base_url=self._settings.base_url
+        )
+
+    async def transcribe(self, audio_data: bytes, filename: str) -> str:
+        audio_file = io.BytesIO(audio_data)
+        audio_file.name = filename
+        transcript = await self._client.audio.transcriptions.create(
+            model=self._settings.whisper_model, file=audio_file
+        )
+        return transcript.text
+
+    async def reply(self, transcription: str) -> str:
+        chat_response = await self._client.chat.completions.create(
+            model=self._settings.chat_model,
+            messages=[
+                {
+                    "role": "system",
+                    "content": self._settings.system_prompt,
+                },
+                {"role": "user", "content": transcription},
+            ],
+            max_tokens=self._settings.max_tokens,
+            temperature=self._settings.temperature,
+        )
+        return chat_response.choices[0].message.content.strip()
+
+    async def synthesize(self, text: str) -> AsyncIterator[bytes]:
+        async with self._client.audio.speech.with_streaming_response.create(
+            model=self._settings.tts_model,
+            voice=self._settings.tts_voice,
+            instructions=self._settings.tts_instructions,
+            input=text,
+            response_format=self._settings.response_format,
+        ) as response:
+            async for chunk in response.iter_bytes(self._settings.tts_chunk_size):
+                yield chunk
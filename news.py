@@ -1,31 +1,40 @@
+import asyncio
+import base64
+import dataclasses
+import json
 import logging
 import os
-import openai
+import time
 import datetime
+from pathlib import Path
+from typing import AsyncIterator
+
 from dotenv import load_dotenv
-from openai._legacy_response import LegacyAPIResponse
+from openai import AsyncOpenAI
 from openai.types import ImagesResponse
 
-from telegram import Update
-from telegram.ext import ApplicationBuilder, CommandHandler, CallbackContext
+from telegram import Bot, Message, Update
+from telegram.constants import MessageLimit
+from telegram.ext import (
+    Application,
+    ApplicationBuilder,
+    CommandHandler,
+    CallbackContext,
+)
 
 # Configure logging
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
-# Load environment variables
-load_dotenv()
-
-
-TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# Telegram allows about one edit of a message per second
+STREAM_EDIT_INTERVAL = 1.0
 
-if not TELEGRAM_TOKEN or not OPENAI_API_KEY:
-    raise EnvironmentError(
-        "Please set TELEGRAM_TOKEN and OPENAI_API_KEY in your environment variables."
-    )
-
-openai.api_key = OPENAI_API_KEY
+# digests are generated and sent to subscribers once a day, ahead of /news
+DIGEST_CACHE_DIR = Path("news_cache")
+DIGEST_TIME = datetime.time(hour=0, minute=10)
+DIGEST_RETRY_INTERVAL = datetime.timedelta(minutes=10)
+DIGEST_KEEP_DAYS = 7
+FANOUT_CONCURRENCY = 20
 
 
 def get_prompt():
@@ -34,13 +43,13 @@ def get_prompt():
     """
 
 
-# Function to get news completion using OpenAI's chat-based API
-def get_openai_news(prompt):
+# Function to stream news completion using OpenAI's chat-based API
+async def stream_openai_news(client: AsyncOpenAI, prompt) -> AsyncIterator[str]:
     previous_day = (datetime.datetime.now() - datetime.timedelta(days=1)).strftime(
         "%Y-%m-%d"
     )
     input_prompt = f"Generate a news summary for {previous_day}: {prompt}"
-    response = openai.chat.completions.create(
+    stream = await client.chat.completions.create(
         model="gpt-4o",
         messages=[
             {
@@ -51,40 +60,292 @@ def get_openai_news(prompt):
         ],
         max_tokens=4000,
         temperature=0.7,
+        stream=True,
     )
-    logger.info(response)
-    logger.info(dir(response))
-
-    return response.choices[0].message.content.strip()
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
 
 
-# Function to get OpenAI image
-def get_openai_image(prompt):
-    response: ImagesResponse = openai.images.generate(
-        prompt=prompt, n=1, size="1024x1024"
+# Function to get OpenAI image, returned as PNG bytes so that it can be cached
+async def get_openai_image(client: AsyncOpenAI, prompt) -> bytes:
+    response: ImagesResponse = await client.images.generate(
+        prompt=prompt, n=1, size="1024x1024", response_format="b64_json"
     )
 
-    logger.info(response)
-    logger.info(dir(response))
+    logger.info(f"Image generated, revised prompt: {response.data[0].revised_prompt}")
+
+    return base64.b64decode(response.data[0].b64_json)
+
+
+def digest_date() -> str:
+    # the prompt depends only on the date, so does the digest
+    return datetime.date.today().isoformat()
+
+
+def split_message(text: str) -> list[str]:
+    return [
+        text[start : start + MessageLimit.MAX_TEXT_LENGTH]
+        for start in range(0, len(text), MessageLimit.MAX_TEXT_LENGTH)
+    ]
+
+
+@dataclasses.dataclass
+class Digest:
+    date: str
+    summary: str
+    image: bytes | None = None
+    # set once the image was sent, later sends reuse the uploaded file
+    image_file_id: str | None = None
+
+
+class DigestCache:
+    """Date-keyed digests on disk, a summary and an image file per day."""
+
+    def __init__(self, path: Path):
+        self._path = path
+
+    def get(self, date: str) -> Digest | None:
+        summary_path = self._path / f"{date}.txt"
+        if not summary_path.is_file():
+            return None
+        image_path = self._path / f"{date}.png"
+        return Digest(
+            date=date,
+            summary=summary_path.read_text(),
+            image=image_path.read_bytes() if image_path.is_file() else None,
+        )
+
+    def put(self, digest: Digest):
+        self._path.mkdir(parents=True, exist_ok=True)
+        if digest.image is not None:
+            (self._path / f"{digest.date}.png").write_bytes(digest.image)
+        # the summary is written last and atomically, it marks the digest complete
+        summary_path = self._path / f"{digest.date}.txt"
+        tmp_path = summary_path.with_suffix(".tmp")
+        tmp_path.write_text(digest.summary)
+        tmp_path.replace(summary_path)
+
+    def prune(self, keep_from: str):
+        for path in self._path.glob("*-*-*.*"):
+            if path.stem < keep_from:
+                path.unlink(missing_ok=True)
+
+
+class DigestSubscribers:
+    """Chats receiving the daily digest, persisted next to the digest cache."""
+
+    def __init__(self, path: Path):
+        self._path = path
+        self.chat_ids: list[int] = []
+        self.sent_date: str | None = None
+        if self._path.is_file():
+            data = json.loads(self._path.read_text())
+            self.chat_ids = data["chat_ids"]
+            self.sent_date = data["sent_date"]
+
+    def add(self, chat_id: int):
+        if chat_id not in self.chat_ids:
+            self.chat_ids.append(chat_id)
+            self._save()
+
+    def remove(self, chat_id: int):
+        if chat_id in self.chat_ids:
+            self.chat_ids.remove(chat_id)
+            self._save()
+
+    def mark_sent(self, date: str):
+        self.sent_date = date
+        self._save()
+
+    def _save(self):
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._path.write_text(
+            json.dumps({"chat_ids": self.chat_ids, "sent_date": self.sent_date})
+        )
+
+
+class DigestGeneration:
+    """A digest being generated, every chat asking meanwhile follows its summary."""
+
+    def __init__(self):
+        self.summary = ""
+        self.summary_done = False
+        self.task: asyncio.Task[Digest] | None = None
+        self._changed = asyncio.Condition()
+
+    async def update(self, summary: str, summary_done: bool = False):
+        self.summary = summary
+        self.summary_done = summary_done
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def follow(self) -> AsyncIterator[str]:
+        while True:
+            summary, summary_done = self.summary, self.summary_done
+            yield summary
+            if summary_done:
+                return
+            # updates made while the consumer was busy are picked up right away,
+            # so the final summary is always yielded
+            async with self._changed:
+                await self._changed.wait_for(
+                    lambda: self.summary != summary or self.summary_done
+                )
+
+
+class NewsDigests:
+    """Daily digests from memory or the disk cache, generated once on a miss."""
+
+    def __init__(self, client: AsyncOpenAI, cache: DigestCache):
+        self._client = client
+        self._cache = cache
+        self._digests: dict[str, Digest] = {}
+        self._generations: dict[str, DigestGeneration] = {}
+
+    def get_cached(self, date: str) -> Digest | None:
+        digest = self._digests.get(date)
+        if digest is None:
+            digest = self._cache.get(date)
+            if digest is not None:
+                self._digests[date] = digest
+        return digest
+
+    def generate(self, date: str) -> DigestGeneration:
+        """Starts the generation of the date's digest or joins the running one."""
+        generation = self._generations.get(date)
+        if generation is None:
+            generation = DigestGeneration()
+            generation.task = asyncio.create_task(self._generate(date, generation))
+            self._generations[date] = generation
+        return generation
+
+    async def get(self, date: str) -> Digest:
+        return self.get_cached(date) or await self.generate(date).task
+
+    def prune(self, keep_days: int):
+        keep_from = (
+            datetime.date.today() - datetime.timedelta(days=keep_days)
+        ).isoformat()
+        self._digests = {
+            date: digest for date, digest in self._digests.items() if date >= keep_from
+        }
+        self._cache.prune(keep_from)
+
+    async def _generate(self, date: str, generation: DigestGeneration) -> Digest:
+        try:
+            summary = ""
+            async for delta in stream_openai_news(self._client, get_prompt()):
+                summary += delta
+                await generation.update(summary)
+            summary = summary.strip()
+            await generation.update(summary, summary_done=True)
+            logger.info(f"News summary of {len(summary)} characters generated")
+
+            image = None
+            try:
+                image = await get_openai_image(
+                    self._client,
+                    f"Новости дня: {summary} Нарисуй сгенерируй картинку, которая отражает суть новостей за день. ",
+                )
+            except Exception:
+                logger.exception("Error generating image")
 
-    return response.data[0].url
+            digest = Digest(date=date, summary=summary, image=image)
+            await asyncio.to_thread(self._cache.put, digest)
+            self._digests[date] = digest
+            return digest
+        finally:
+            del self._generations[date]
+            if not generation.summary_done:
+                await generation.update(generation.summary, summary_done=True)
+
+
+class StreamingMessage:
+    """Shows text as it is generated by editing the sent messages in place.
+
+    Edits are throttled to STREAM_EDIT_INTERVAL, text longer than one
+    Telegram message continues in the next one.
+    """
+
+    def __init__(self, bot: Bot, chat_id: int):
+        self._bot = bot
+        self._chat_id = chat_id
+        self.text = ""
+        self._messages: list[Message] = []
+        self._shown: list[str] = []
+        self._flushed_at = 0.0
+
+    async def update(self, text: str):
+        self.text = text
+        if time.monotonic() - self._flushed_at >= STREAM_EDIT_INTERVAL:
+            await self.flush()
+
+    async def flush(self):
+        self._flushed_at = time.monotonic()
+        for idx, part in enumerate(split_message(self.text)):
+            if not part.strip():
+                continue
+            if idx == len(self._messages):
+                message = await self._bot.send_message(chat_id=self._chat_id, text=part)
+                self._messages.append(message)
+                self._shown.append(part)
+            elif self._shown[idx] != part:
+                await self._messages[idx].edit_text(part)
+                self._shown[idx] = part
+
+
+async def send_digest(bot: Bot, chat_id: int, digest: Digest, with_summary=True):
+    if with_summary:
+        for part in split_message(digest.summary):
+            await bot.send_message(chat_id=chat_id, text=part)
+    if digest.image is not None:
+        message = await bot.send_photo(
+            chat_id=chat_id,
+            photo=digest.image_file_id or digest.image,
+            caption="Image for the news",
+        )
+        digest.image_file_id = message.photo[-1].file_id
+
+
+async def fan_out_digest(bot: Bot, digest: Digest, chat_ids: list[int]):
+    semaphore = asyncio.Semaphore(FANOUT_CONCURRENCY)
+
+    async def send(chat_id: int):
+        async with semaphore:
+            try:
+                await send_digest(bot, chat_id, digest)
+            except Exception:
+                logger.exception(f"Error sending the digest to {chat_id}")
+
+    if not chat_ids:
+        return
+    # the first send uploads the image, the others reuse its file id
+    first_chat_id, *chat_ids = chat_ids
+    await send(first_chat_id)
+    await asyncio.gather(*(send(chat_id) for chat_id in chat_ids))
 
 
 # Asynchronous function to handle sending news
 async def send_news(update: Update, context: CallbackContext):
     chat_id = update.effective_chat.id
-    prompt = get_prompt()
+    digests: NewsDigests = context.bot_data["news_digests"]
+    date = digest_date()
     try:
-        news_summary = get_openai_news(prompt)
-        await context.bot.send_message(chat_id=chat_id, text=news_summary)
+        digest = digests.get_cached(date)
+        if digest is not None:
+            await send_digest(context.bot, chat_id, digest)
+            return
 
-        # Generate and send image
-        image_url = get_openai_image(
-            f"Новости дня: {news_summary} Нарисуй сгенерируй картинку, которая отражает суть новостей за день. "
-        )
-        await context.bot.send_message(
-            chat_id=chat_id, text=f"Image for the news:\n{image_url}"
-        )
+        # not pre-generated yet, follow the generation shared by all chats
+        generation = digests.generate(date)
+        message = StreamingMessage(context.bot, chat_id)
+        async for summary in generation.follow():
+            await message.update(summary)
+        # the image is still being generated while the last edit is sent
+        await message.flush()
+        digest = await generation.task
+        await send_digest(context.bot, chat_id, digest, with_summary=False)
     except Exception as e:
         await context.bot.send_message(
             chat_id=chat_id, text=f"Error generating news or image: {e}"
@@ -92,10 +353,103 @@ async def send_news(update: Update, context: CallbackContext):
         logger.exception("Error generating news or image")
 
 
-def main():
-    app = ApplicationBuilder().token(TELEGRAM_TOKEN).build()
+async def subscribe(update: Update, context: CallbackContext):
+    subscribers: DigestSubscribers = context.bot_data["digest_subscribers"]
+    subscribers.add(update.effective_chat.id)
+    await context.bot.send_message(
+        chat_id=update.effective_chat.id,
+        text=f"The news digest will be sent daily at {DIGEST_TIME:%H:%M}",
+    )
+
+
+async def unsubscribe(update: Update, context: CallbackContext):
+    subscribers: DigestSubscribers = context.bot_data["digest_subscribers"]
+    subscribers.remove(update.effective_chat.id)
+    await context.bot.send_message(
+        chat_id=update.effective_chat.id, text="Unsubscribed from the news digest"
+    )
+
+
+async def run_daily_digests(app: Application):
+    """Pre-generates each day's digest and sends it to the subscribed chats."""
+    digests: NewsDigests = app.bot_data["news_digests"]
+    subscribers: DigestSubscribers = app.bot_data["digest_subscribers"]
+    while True:
+        now = datetime.datetime.now()
+        run_at = datetime.datetime.combine(now.date(), DIGEST_TIME)
+        date = digest_date()
+        if now >= run_at and subscribers.sent_date != date:
+            try:
+                digest = await digests.get(date)
+                await fan_out_digest(app.bot, digest, subscribers.chat_ids)
+                subscribers.mark_sent(date)
+                digests.prune(DIGEST_KEEP_DAYS)
+            except Exception:
+                logger.exception("Error pre-generating the news digest")
+                await asyncio.sleep(DIGEST_RETRY_INTERVAL.total_seconds())
+                continue
+        if now >= run_at:
+            run_at += datetime.timedelta(days=1)
+        await asyncio.sleep((run_at - datetime.datetime.now()).total_seconds())
+
+
+async def start_daily_digests(app: Application):
+    app.bot_data["daily_digests"] = asyncio.create_task(run_daily_digests(app))
+
+
+async def stop_daily_digests(app: Application):
+    app.bot_data["daily_digests"].cancel()
+
+
+def build_application() -> Application:
+    telegram_token = os.getenv("TELEGRAM_TOKEN")
+    openai_api_key = os.getenv("OPENAI_API_KEY")
+
+    if not telegram_token or not openai_api_key:
+        raise EnvironmentError(
+            "Please set TELEGRAM_TOKEN and OPENAI_API_KEY in your environment variables."
+        )
+
+    # updates are handled concurrently, one /news does not hold up the others
+    app = (
+        ApplicationBuilder()
+        .token(telegram_token)
+        .concurrent_updates(True)
+        .post_init(start_daily_digests)
+        .post_stop(stop_daily_digests)
+        .build()
+    )
+    app.bot_data["news_digests"] = NewsDigests(
+        AsyncOpenAI(api_key=openai_api_key), DigestCache(DIGEST_CACHE_DIR)
+    )
+    app.bot_data["digest_subscribers"] = DigestSubscribers(
+        DIGEST_CACHE_DIR / "subscribers.json"
+    )
     app.add_handler(CommandHandler("news", send_news))
-    app.run_polling()
+    app.add_handler(CommandHandler("subscribe", subscribe))
+    app.add_handler(CommandHandler("unsubscribe", unsubscribe))
+    return app
+
+
+async def run_news_bot(app: Application):
+    """Runs the bot on the current event loop until cancelled."""
+    async with app:
+        await app.updater.start_polling()
+        await app.start()
+        await start_daily_digests(app)
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await stop_daily_digests(app)
+            await app.updater.stop()
+            await app.stop()
+
+
+def main():
+    # Load environment variables
+    load_dotenv()
+
+    build_application().run_polling()
 
 
 if __name__ == "__main__":
@@ -1,9 +1,13 @@
+import asyncio
+import dataclasses
 import datetime
+import hashlib
+import time
 
 from pydantic.v1 import BaseSettings
 from rfeed import *
 
-from invest.portfolio_informer import PortfolioInformer
+from invest.portfolio_informer import PortfolioInfo, PortfolioInformer
 
 
 class RSSFeederSettings(BaseSettings):
@@ -11,6 +15,16 @@ class RSSFeederSettings(BaseSettings):
     current_yield_format: str = "   {current_yield:,.0f} P"
     yield_percent_format: str = "   {yield_percent:.2%}"
     info_format: str = "{total_amount}\n{current_yield}\n{yield_percent}\n"
+    # rendered feed is served from memory for this long
+    cache_ttl: datetime.timedelta = datetime.timedelta(minutes=1)
+
+
+@dataclasses.dataclass(frozen=True)
+class RenderedFeed:
+    content: bytes
+    etag: str
+    last_modified: datetime.datetime
+    info: PortfolioInfo
 
 
 class RSSFeeder:
@@ -20,8 +34,51 @@ class RSSFeeder:
         self._portfolio_informer = portfolio_informer
         self._settings = settings
 
-    async def get_feed(self) -> Feed:
+        self._rendered_feed: RenderedFeed | None = None
+        self._rendered_at = 0.0
+        self._refresh: asyncio.Future | None = None
+
+    async def get_rendered_feed(self) -> RenderedFeed:
+        """Returns the cached feed, refreshing it at most once per cache_ttl.
+
+        Concurrent requests during a refresh share the same upstream call.
+        """
+        if (
+            self._rendered_feed is not None
+            and time.monotonic() - self._rendered_at
+            < self._settings.cache_ttl.total_seconds()
+        ):
+            return self._rendered_feed
+        if self._refresh is None:
+            self._refresh = asyncio.ensure_future(self._render_feed())
+            self._refresh.add_done_callback(self._on_refreshed)
+        return await asyncio.shield(self._refresh)
+
+    def _on_refreshed(self, refresh: asyncio.Future):
+        self._refresh = None
+        if not refresh.cancelled() and refresh.exception() is None:
+            self._rendered_feed = refresh.result()
+            self._rendered_at = time.monotonic()
+
+    async def _render_feed(self) -> RenderedFeed:
         info = await self._portfolio_informer.get_info()
+        # keep validators stable while the portfolio did not change
+        if self._rendered_feed is not None and self._rendered_feed.info == info:
+            return self._rendered_feed
+        content = self._build_feed(info).rss().encode()
+        return RenderedFeed(
+            content=content,
+            etag=f'"{hashlib.sha1(content).hexdigest()}"',
+            last_modified=datetime.datetime.now(datetime.timezone.utc).replace(
+                microsecond=0
+            ),
+            info=info,
+        )
+
+    async def get_feed(self) -> Feed:
+        return self._build_feed(await self._portfolio_informer.get_info())
+
+    def _build_feed(self, info: PortfolioInfo) -> Feed:
         total_amount = self._settings.total_amount_format.format(
             total_amount=info.total_amount,
         )
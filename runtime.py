@@ -0,0 +1,308 @@
+import asyncio
+import collections.abc
+import contextvars
+import dataclasses
+import logging
+import random
+import signal
+import time
+from enum import Enum
+from typing import Any, Awaitable, Callable, Coroutine
+
+import uvicorn
+from dotenv import load_dotenv
+from punq import Container
+
+import news
+from invest.marketdata.settings import MarketDataSnifferSettings
+from invest.marketdata.sharding import ShardedMarketDataSniffer
+from invest.marketdata.sniffer import MarketDataSniffer
+from runtime_settings import RuntimeSettings
+from server import RSSServer
+from smalltv.market_feed import SmallTVMarketFeed
+
+logger = logging.getLogger(__name__)
+
+
+class RestartPolicy(str, Enum):
+    # the whole runtime shuts down once the task ends
+    never = "never"
+    on_failure = "on_failure"
+    always = "always"
+
+
+@dataclasses.dataclass
+class TaskStats:
+    starts: int = 0
+    failures: int = 0
+    last_error: str | None = None
+    # event loop time of the task and every task it created, code running in
+    # worker threads (asyncio.to_thread) is not included
+    cpu_time: float = 0
+    busy_time: float = 0
+    steps: int = 0
+    # the longest the task held the event loop without awaiting
+    max_step: float = 0
+
+    @property
+    def mean_step(self) -> float:
+        if not self.steps:
+            return 0
+        return self.busy_time / self.steps
+
+
+@dataclasses.dataclass
+class ManagedTask:
+    name: str
+    run: Callable[[], Awaitable[Any]]
+    restart: RestartPolicy = RestartPolicy.on_failure
+    # asks the task to finish on shutdown, it is cancelled if it does not in time;
+    # tasks without it are cancelled right away
+    stop: Callable[[], Any] | None = None
+    stats: TaskStats = dataclasses.field(default_factory=TaskStats)
+
+
+# stats of the managed task the current asyncio task belongs to
+_task_stats: contextvars.ContextVar[TaskStats | None] = contextvars.ContextVar(
+    "runtime_task_stats", default=None
+)
+
+
+class _MeasuredCoroutine(collections.abc.Coroutine):
+    """Accounts the time of every step of the wrapped coroutine to its task."""
+
+    def __init__(self, coro: Coroutine, stats: TaskStats):
+        self._coro = coro
+        self._stats = stats
+
+    def send(self, value):
+        return self._step(self._coro.send, value)
+
+    def throw(self, *args):
+        return self._step(self._coro.throw, *args)
+
+    def close(self):
+        self._coro.close()
+
+    def __await__(self):
+        return self
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.send(None)
+
+    def _step(self, method, *args):
+        cpu_started_at = time.thread_time()
+        started_at = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            step = time.perf_counter() - started_at
+            self._stats.cpu_time += time.thread_time() - cpu_started_at
+            self._stats.busy_time += step
+            self._stats.steps += 1
+            self._stats.max_step = max(self._stats.max_step, step)
+
+
+def _measuring_task_factory(loop, coro, **kwargs):
+    # tasks inherit the context of their creator, so their time is accounted
+    # to the managed task that started them
+    stats = _task_stats.get()
+    if stats is not None:
+        coro = _MeasuredCoroutine(coro, stats)
+    return asyncio.Task(coro, loop=loop, **kwargs)
+
+
+class _Server(uvicorn.Server):
+    def install_signal_handlers(self):
+        # signals are handled by the runtime, which stops the server
+        pass
+
+
+class Runtime:
+    """Runs managed tasks on one event loop with restarts and a graceful stop."""
+
+    def __init__(self, runtime_settings: RuntimeSettings):
+        self._settings = runtime_settings
+        self.tasks: list[ManagedTask] = []
+        self._shutdown: asyncio.Event | None = None
+        self._stopping = False
+        self._started_at = time.monotonic()
+
+    def add(self, task: ManagedTask):
+        self.tasks.append(task)
+
+    def shutdown(self):
+        if self._shutdown is not None:
+            self._shutdown.set()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        loop.set_task_factory(_measuring_task_factory)
+        self._shutdown = asyncio.Event()
+        self._stopping = False
+        self._started_at = time.monotonic()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self.shutdown)
+
+        supervisors = [
+            asyncio.create_task(self._supervise(task), name=task.name)
+            for task in self.tasks
+        ]
+        reporter = asyncio.create_task(self._report_stats())
+        try:
+            await self._shutdown.wait()
+        finally:
+            logger.info("runtime is shutting down")
+            reporter.cancel()
+            await self._stop(supervisors)
+            self._log_stats()
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                loop.remove_signal_handler(sig)
+            loop.set_task_factory(None)
+
+    async def _supervise(self, task: ManagedTask):
+        _task_stats.set(task.stats)
+        failures_in_row = 0
+        while not self._stopping:
+            task.stats.starts += 1
+            started_at = time.monotonic()
+            try:
+                await _MeasuredCoroutine(task.run(), task.stats)
+            except Exception as e:
+                task.stats.failures += 1
+                task.stats.last_error = repr(e)
+                logger.exception(f"{task.name} failed")
+                if task.restart == RestartPolicy.never:
+                    self.shutdown()
+                    return
+            else:
+                logger.info(f"{task.name} finished")
+                if task.restart != RestartPolicy.always:
+                    if task.restart == RestartPolicy.never:
+                        self.shutdown()
+                    return
+            if self._stopping:
+                return
+
+            # a task that ran for a while before failing starts over with short delays
+            if time.monotonic() - started_at > self._restart_max_delay:
+                failures_in_row = 0
+            failures_in_row += 1
+            delay = self._restart_delay(failures_in_row)
+            logger.info(f"restarting {task.name} in {delay:.1f}s")
+            try:
+                await asyncio.wait_for(self._shutdown.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    @property
+    def _restart_max_delay(self) -> float:
+        return self._settings.restart_max_delay.total_seconds()
+
+    def _restart_delay(self, failures_in_row: int) -> float:
+        delay = min(
+            self._settings.restart_min_delay.total_seconds()
+            * 2 ** (failures_in_row - 1),
+            self._restart_max_delay,
+        )
+        return random.uniform(delay / 2, delay)
+
+    async def _stop(self, supervisors: list[asyncio.Task]):
+        self._stopping = True
+        stopping = []
+        for task, supervisor in zip(self.tasks, supervisors):
+            if supervisor.done():
+                continue
+            if task.stop is None:
+                supervisor.cancel()
+                continue
+            try:
+                task.stop()
+                stopping.append(supervisor)
+            except Exception:
+                logger.exception(f"{task.name} failed to stop")
+                supervisor.cancel()
+        if stopping:
+            _, pending = await asyncio.wait(
+                stopping, timeout=self._settings.shutdown_timeout.total_seconds()
+            )
+            for supervisor in pending:
+                logger.warning(
+                    f"{supervisor.get_name()} did not stop in time, cancelling"
+                )
+                supervisor.cancel()
+        await asyncio.gather(*supervisors, return_exceptions=True)
+
+    async def _report_stats(self):
+        while True:
+            await asyncio.sleep(self._settings.stats_interval.total_seconds())
+            self._log_stats()
+
+    def _log_stats(self):
+        elapsed = time.monotonic() - self._started_at
+        for task in self.tasks:
+            stats = task.stats
+            logger.info(
+                f"{task.name}: cpu {stats.cpu_time:.2f}s"
+                f" ({stats.cpu_time / elapsed:.1%} of {elapsed:.0f}s),"
+                f" {stats.steps} steps, mean step {stats.mean_step * 1000:.2f}ms,"
+                f" max step {stats.max_step * 1000:.2f}ms,"
+                f" starts {stats.starts}, failures {stats.failures}"
+            )
+
+
+def build_runtime(container: Container) -> Runtime:
+    """Adds the tasks enabled in RuntimeSettings, resolved from the container."""
+    settings = container.resolve(RuntimeSettings)
+    runtime = Runtime(settings)
+
+    if settings.server:
+        server = _Server(
+            uvicorn.Config(
+                container.resolve(RSSServer), host=settings.host, port=settings.port
+            )
+        )
+
+        def stop_server():
+            server.should_exit = True
+
+        runtime.add(
+            ManagedTask(
+                "server", server.serve, restart=RestartPolicy.never, stop=stop_server
+            )
+        )
+
+    if settings.sniffer:
+        if container.resolve(MarketDataSnifferSettings).shards > 1:
+            # cancelling it terminates the shard processes
+            sniffer = container.resolve(ShardedMarketDataSniffer)
+        else:
+            # the stream only notices stop() on its next message, so it is cancelled
+            sniffer = container.resolve(MarketDataSniffer)
+        runtime.add(ManagedTask("sniffer", sniffer.run))
+
+    if settings.smalltv:
+        runtime.add(ManagedTask("smalltv", container.resolve(SmallTVMarketFeed).run))
+
+    if settings.news_bot:
+        runtime.add(
+            ManagedTask("news_bot", lambda: news.run_news_bot(news.build_application()))
+        )
+
+    return runtime
+
+
+def main():
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+
+    from deps import get_container
+
+    asyncio.run(build_runtime(get_container()).run())
+
+
+if __name__ == "__main__":
+    main()
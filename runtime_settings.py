@@ -0,0 +1,23 @@
+from datetime import timedelta
+
+from pydantic.v1 import BaseSettings
+
+
+class RuntimeSettings(BaseSettings):
+    host = "0.0.0.0"
+    port = 8000
+
+    # tasks run by the runtime
+    server = True
+    sniffer = True
+    news_bot = False
+    smalltv = False
+
+    # restarts back off from restart_min_delay up to restart_max_delay
+    restart_min_delay = timedelta(seconds=1)
+    restart_max_delay = timedelta(minutes=1)
+    shutdown_timeout = timedelta(seconds=10)
+    stats_interval = timedelta(minutes=5)
+
+    class Config:
+        env_prefix = "RUNTIME_"
@@ -0,0 +1,52 @@
+"""Reports bytes saved and latency per stage of AudioPreprocessor.
+
+Usage: python -m scripts.benchmark_audio_preprocessing uploaded_audio/*.wav
+"""
+
+import sys
+import time
+from pathlib import Path
+
+from m5stick.preprocessing import AudioPreprocessor
+from m5stick.settings import AudioPreprocessingSettings
+
+
+def benchmark(preprocessor: AudioPreprocessor, path: Path):
+    wav_bytes = path.read_bytes()
+    timings = {}
+
+    started_at = time.perf_counter()
+    samples, sample_rate = preprocessor.decode(wav_bytes)
+    timings["decode"] = time.perf_counter() - started_at
+
+    started_at = time.perf_counter()
+    trimmed = preprocessor.trim_silence(samples, sample_rate)
+    timings["vad"] = time.perf_counter() - started_at
+    if not len(trimmed):
+        print(f"{path.name}: no speech detected")
+        return
+
+    started_at = time.perf_counter()
+    resampled, resampled_rate = preprocessor.resample(trimmed, sample_rate)
+    timings["resample"] = time.perf_counter() - started_at
+
+    started_at = time.perf_counter()
+    processed = preprocessor.encode(resampled, resampled_rate)
+    timings["encode"] = time.perf_counter() - started_at
+
+    saved = 1 - len(processed) / len(wav_bytes)
+    print(
+        f"{path.name}: {len(wav_bytes)} -> {len(processed)} bytes ({saved:.0%} saved),",
+        f"{len(samples) / sample_rate:.2f}s -> {len(resampled) / resampled_rate:.2f}s;",
+        ", ".join(f"{stage} {value * 1000:.2f}ms" for stage, value in timings.items()),
+    )
+
+
+def main():
+    preprocessor = AudioPreprocessor(AudioPreprocessingSettings())
+    for path in sys.argv[1:]:
+        benchmark(preprocessor, Path(path))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Compares a fresh broker channel per call with the pooled BrokerClientProvider.
+
+Runs against a local stub UsersService, so no broker token is needed. The stub
+is plain-text gRPC; against the real TLS endpoint the difference is larger.
+"""
+
+import asyncio
+import statistics
+import time
+
+import grpc
+from tinkoff.invest.async_services import AsyncServices
+from tinkoff.invest.grpc import users_pb2, users_pb2_grpc
+
+from invest.client_provider import BrokerClientProvider
+from invest.invest_settings import InvestSettings
+
+CALLS = 200
+
+
+class StubUsersService(users_pb2_grpc.UsersServiceServicer):
+    async def GetAccounts(self, request, context):
+        return users_pb2.GetAccountsResponse(
+            accounts=[users_pb2.Account(id="stub-account", name="stub")]
+        )
+
+
+class LocalClient:
+    """AsyncClient counterpart opening a plain-text channel to the stub."""
+
+    def __init__(self, target: str, token: str):
+        self._target = target
+        self._token = token
+        self._channel: grpc.aio.Channel | None = None
+
+    async def __aenter__(self) -> AsyncServices:
+        self._channel = grpc.aio.insecure_channel(self._target)
+        return AsyncServices(self._channel, token=self._token)
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self._channel.close()
+
+
+class LocalBrokerClientProvider(BrokerClientProvider):
+    def __init__(self, target: str):
+        super().__init__(InvestSettings(token="stub"))
+        self._target = target
+
+    def _create_client(self) -> LocalClient:
+        return LocalClient(self._target, self._invest_settings.token)
+
+
+async def measure(call) -> list[float]:
+    latencies = []
+    for _ in range(CALLS):
+        started_at = time.perf_counter()
+        await call()
+        latencies.append(time.perf_counter() - started_at)
+    return latencies
+
+
+def report(name: str, latencies: list[float]):
+    latencies = sorted(latencies)
+    print(
+        f"{name:>16}:",
+        f"mean {statistics.mean(latencies) * 1000:.2f}ms,",
+        f"p50 {latencies[len(latencies) // 2] * 1000:.2f}ms,",
+        f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.2f}ms",
+    )
+
+
+async def main():
+    server = grpc.aio.server()
+    users_pb2_grpc.add_UsersServiceServicer_to_server(StubUsersService(), server)
+    port = server.add_insecure_port("127.0.0.1:0")
+    await server.start()
+    target = f"127.0.0.1:{port}"
+
+    async def fresh_channel_call():
+        async with LocalClient(target, "stub") as client:
+            await client.users.get_accounts()
+
+    provider = LocalBrokerClientProvider(target)
+
+    async def pooled_call():
+        async with provider.client() as client:
+            await client.users.get_accounts()
+
+    try:
+        report("fresh channel", await measure(fresh_channel_call))
+        report("pooled channel", await measure(pooled_call))
+    finally:
+        await provider.close()
+        await server.stop(None)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,172 @@
+"""Compares the Decimal and fixed point price math of the sniffer hot loop.
+
+Feeds the same random last prices and trades to ShareInfoStatist and
+FixedPointShareInfoStatist, checks that both raise the same alerts with the
+same change percent and the same volumes, and reports the time per message.
+"""
+
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from tinkoff.invest import Candle, Quotation, Trade
+from tinkoff.invest.utils import quotation_to_decimal
+
+from invest.marketdata.settings import MarketDataSnifferSettings
+from invest.marketdata.share_info.fixed_point_statist import (
+    FixedPointShareInfoStatist,
+)
+from invest.marketdata.share_info.statist import ShareInfoStatist
+from invest.marketdata.share_info.store import PRICE_SCALE, quotation_to_scaled
+
+MESSAGES = 100_000
+CANDLE_EVERY = 20
+# a few trades per second, so some trades exceed the mean volume per second
+MESSAGE_INTERVAL = timedelta(milliseconds=200)
+# relative price step per message, and the chance of a jump above the threshold
+PRICE_VOLATILITY = 0.0005
+PRICE_JUMP_PROBABILITY = 0.002
+PRICE_JUMP = 0.02
+
+
+def quotation(price: float) -> Quotation:
+    units = int(price)
+    return Quotation(units=units, nano=round((price - units) * 1e9))
+
+
+def generate_messages(seed: int = 0) -> list[Candle | Quotation | Trade]:
+    rng = random.Random(seed)
+    price = 250.0
+    started_at = datetime.now(timezone.utc)
+    messages = []
+    for i in range(MESSAGES):
+        step = PRICE_VOLATILITY
+        if rng.random() < PRICE_JUMP_PROBABILITY:
+            step = PRICE_JUMP
+        price *= 1 + rng.uniform(-step, step)
+        at = started_at + MESSAGE_INTERVAL * i
+        if i % CANDLE_EVERY == 0:
+            messages.append(
+                Candle(
+                    open=quotation(price),
+                    high=quotation(price * 1.001),
+                    low=quotation(price * 0.999),
+                    close=quotation(price),
+                    time=at,
+                )
+            )
+        elif rng.random() < 0.5:
+            messages.append(quotation(price))
+        else:
+            messages.append(
+                Trade(price=quotation(price), quantity=rng.randint(1, 100), time=at)
+            )
+    return messages
+
+
+def run_decimal(
+    statist: ShareInfoStatist, messages: list, threshold: float
+) -> tuple[list[tuple[int, Decimal]], int]:
+    """The Decimal branch of MarketDataSniffer._run."""
+    alerts = []
+    large_trades = 0
+    for i, message in enumerate(messages):
+        if isinstance(message, Candle):
+            statist.observe_candle_mean(message)
+        elif isinstance(message, Quotation):
+            last_candles_mean = statist.last_candles_mean
+            change_percent = (
+                (quotation_to_decimal(message) - last_candles_mean)
+                / last_candles_mean
+                * 100
+            )
+            if abs(change_percent) > threshold:
+                alerts.append((i, change_percent))
+        else:
+            statist.observe_trade(message)
+            large_trades += (
+                quotation_to_decimal(message.price) * message.quantity
+                > statist.last_trades_mean_volume_per_second
+            )
+    return alerts, large_trades
+
+
+def run_fixed_point(
+    statist: FixedPointShareInfoStatist, messages: list
+) -> tuple[list[tuple[int, Decimal]], int]:
+    """The fixed point branch of MarketDataSniffer._run."""
+    alerts = []
+    large_trades = 0
+    for i, message in enumerate(messages):
+        if isinstance(message, Candle):
+            statist.observe_candle_mean(message)
+        elif isinstance(message, Quotation):
+            if statist.is_high_change(message):
+                alerts.append((i, statist.change_percent(message)))
+        else:
+            statist.observe_trade(message)
+            large_trades += (
+                quotation_to_scaled(message.price) * message.quantity / PRICE_SCALE
+                > statist.last_trades_mean_volume_per_second
+            )
+    return alerts, large_trades
+
+
+def main():
+    settings = MarketDataSnifferSettings()
+    messages = generate_messages()
+
+    decimal_statist = ShareInfoStatist(settings)
+    started_at = time.perf_counter()
+    decimal_alerts, decimal_large_trades = run_decimal(
+        decimal_statist, messages, settings.change_percent_threshold
+    )
+    decimal_elapsed = time.perf_counter() - started_at
+
+    fixed_point_statist = FixedPointShareInfoStatist(settings)
+    started_at = time.perf_counter()
+    fixed_point_alerts, fixed_point_large_trades = run_fixed_point(
+        fixed_point_statist, messages
+    )
+    fixed_point_elapsed = time.perf_counter() - started_at
+
+    assert [i for i, _ in decimal_alerts] == [i for i, _ in fixed_point_alerts]
+    assert decimal_large_trades == fixed_point_large_trades
+    max_difference = max(
+        (
+            abs(decimal - fixed_point)
+            for (_, decimal), (_, fixed_point) in zip(
+                decimal_alerts, fixed_point_alerts
+            )
+        ),
+        default=Decimal(0),
+    )
+    assert max_difference < Decimal("1e-20"), max_difference
+    assert decimal_statist.last_candles_mean == fixed_point_statist.last_candles_mean
+    assert (
+        abs(
+            float(decimal_statist.last_trades_mean_volume_per_second)
+            - fixed_point_statist.last_trades_mean_volume_per_second
+        )
+        < 1e-6 * fixed_point_statist.last_trades_mean_volume_per_second
+    )
+
+    print(
+        f"{len(decimal_alerts)} identical alerts,",
+        f"{decimal_large_trades} identical large trades,",
+        f"max change percent difference {float(max_difference):.1e}",
+    )
+    for name, elapsed in (
+        ("decimal", decimal_elapsed),
+        ("fixed point", fixed_point_elapsed),
+    ):
+        print(
+            f"{name:>11}: {elapsed * 1e6 / len(messages):.2f}us per message,",
+            f"{len(messages) / elapsed:,.0f} messages/s",
+        )
+    print(f"speedup x{decimal_elapsed / fixed_point_elapsed:.2f}")
+
+
+if __name__ == "__main__":
+    main()
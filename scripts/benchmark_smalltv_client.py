@@ -0,0 +1,120 @@
+"""Compares per-request connections with the pooled SmallTVClient.
+
+Runs against a local fake device that counts TCP connections, uploads and
+files on its flash. Frames repeat like the market feed's do, so upload
+dedup is visible in the report.
+"""
+
+import asyncio
+import time
+
+import requests
+from aiohttp import web
+
+from smalltv.client import SmallTVClient
+from smalltv.random_image import generate_ohlc
+from smalltv.renderer import CandlestickRenderer
+
+FRAMES = 60
+DISTINCT_FRAMES = 3
+# each frame stays unchanged for a few ticks, like a share between candles
+FRAME_REPEATS = 4
+DEVICE_DELAY = 0.01
+
+
+class FakeDevice:
+    def __init__(self):
+        self.connections: set[tuple[str, int]] = set()
+        self.uploads = 0
+        self.files: dict[str, int] = {}
+        self.shown: str | None = None
+
+    async def do_upload(self, request: web.Request) -> web.Response:
+        self._track(request)
+        form = await request.post()
+        file = form["file"]
+        self.files[request.query["dir"] + file.filename] = len(file.file.read())
+        self.uploads += 1
+        await asyncio.sleep(DEVICE_DELAY)
+        return web.Response(text="OK")
+
+    async def set(self, request: web.Request) -> web.Response:
+        self._track(request)
+        if "clear" in request.query:
+            self.files.clear()
+        else:
+            self.shown = request.query["img"]
+        await asyncio.sleep(DEVICE_DELAY)
+        return web.Response(text="OK")
+
+    def _track(self, request: web.Request):
+        self.connections.add(request.transport.get_extra_info("peername"))
+
+
+def upload_with_requests(server: str, image: bytes, filename: str):
+    """What SmallTV did before: bare requests calls, one connection each."""
+    resp = requests.post(
+        f"{server}/doUpload",
+        params={"dir": "/image/"},
+        files={"file": (filename, image, "image/jpeg")},
+    )
+    resp.raise_for_status()
+    resp = requests.get(f"{server}/set", params={"img": f"/image/{filename}"})
+    resp.raise_for_status()
+
+
+def report(name: str, device: FakeDevice, elapsed: float):
+    print(
+        f"{name:>16}: {elapsed * 1000 / FRAMES:.2f}ms per frame,",
+        f"{len(device.connections)} connections, {device.uploads} uploads,",
+        f"{len(device.files)} files on device",
+    )
+
+
+async def serve(device: FakeDevice) -> tuple[web.AppRunner, str]:
+    app = web.Application()
+    app.router.add_post("/doUpload", device.do_upload)
+    app.router.add_get("/set", device.set)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+async def main():
+    renderer = CandlestickRenderer()
+    distinct = [renderer.render(generate_ohlc()) for _ in range(DISTINCT_FRAMES)]
+    frames = [distinct[i // FRAME_REPEATS % DISTINCT_FRAMES] for i in range(FRAMES)]
+
+    device = FakeDevice()
+    runner, server = await serve(device)
+    try:
+        started_at = time.perf_counter()
+        for i, frame in enumerate(frames):
+            # the old main loop: unique file names and a clear every 10 frames
+            if i % 10 == 0:
+                await asyncio.to_thread(
+                    requests.get, f"{server}/set", params={"clear": "image"}
+                )
+            await asyncio.to_thread(upload_with_requests, server, frame, f"{i}.jpg")
+        report("requests", device, time.perf_counter() - started_at)
+    finally:
+        await runner.cleanup()
+
+    device = FakeDevice()
+    runner, server = await serve(device)
+    client = SmallTVClient(server)
+    try:
+        started_at = time.perf_counter()
+        for frame in frames:
+            await client.show(frame)
+        report("SmallTVClient", device, time.perf_counter() - started_at)
+    finally:
+        await client.close()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
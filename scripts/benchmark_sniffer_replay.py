@@ -0,0 +1,238 @@
+"""Replays a market data recording through MarketDataSniffer for each statist backend.
+
+Usage: python -m scripts.benchmark_sniffer_replay [market_data.rec [speed]]
+
+Without a recording a synthetic one is generated, so no broker token is needed.
+Without a speed the stream is replayed as fast as the sniffer consumes it.
+"""
+
+import asyncio
+import itertools
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from google.protobuf.timestamp_pb2 import Timestamp
+from tinkoff.invest import GetCandlesResponse, MarketDataResponse, Share
+from tinkoff.invest._grpc_helpers import protobuf_to_dataclass
+from tinkoff.invest.grpc import common_pb2, instruments_pb2, marketdata_pb2
+
+from invest.instrument_cache import InstrumentCache, InstrumentCacheSettings
+from invest.marketdata.recording import (
+    MarketDataRecorder,
+    MarketDataRecording,
+    ReplayBrokerClientProvider,
+)
+from invest.marketdata.settings import MarketDataSnifferSettings, StatistBackend
+from invest.marketdata.share_info.statist_factory import ShareInfoStatistFactory
+from invest.marketdata.share_info.store import ShareStatsStore
+from invest.marketdata.sniffer import MarketDataSniffer
+
+SHARES = 50
+MESSAGES = 50_000
+# recorded pace of the synthetic stream
+MESSAGE_INTERVAL = timedelta(milliseconds=1)
+# relative price step per message, and the chance of a jump above the threshold
+PRICE_VOLATILITY = 0.0005
+PRICE_JUMP_PROBABILITY = 0.001
+PRICE_JUMP = 0.01
+
+
+class CountingAlertDispatcher:
+    def __init__(self):
+        self.alerts = 0
+
+    def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def submit(self, share: Share, change_percent: Decimal | float):
+        self.alerts += 1
+
+
+class QuietNotifier:
+    async def notify_about_start(self, share_info_containers):
+        pass
+
+    async def notify_error(self, e):
+        if not isinstance(e, asyncio.CancelledError):
+            print("sniffer error", repr(e))
+
+
+def quotation(price: float) -> common_pb2.Quotation:
+    units = int(price)
+    return common_pb2.Quotation(units=units, nano=round((price - units) * 1e9))
+
+
+def timestamp(value: datetime) -> Timestamp:
+    result = Timestamp()
+    result.FromDatetime(value)
+    return result
+
+
+def synthesize_recording(path: str, seed: int = 0):
+    """Writes a random walk of candles, last prices and trades for SHARES shares."""
+    rng = random.Random(seed)
+    interval_ns = MESSAGE_INTERVAL // timedelta(microseconds=1) * 1000
+    recorder = MarketDataRecorder(path, clock=itertools.count(0, interval_ns).__next__)
+    started_at = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+
+    uids = [str(uuid.UUID(int=rng.getrandbits(128))) for _ in range(SHARES)]
+    prices = {uid: rng.uniform(10, 1000) for uid in uids}
+    for i, uid in enumerate(uids):
+        share = instruments_pb2.Share(
+            uid=uid, figi=f"FIGI{i:08}", ticker=f"T{i}", name=f"Share {i}"
+        )
+        recorder.record_share(protobuf_to_dataclass(share, Share))
+        candles = marketdata_pb2.GetCandlesResponse(
+            candles=[
+                marketdata_pb2.HistoricCandle(
+                    open=quotation(prices[uid]),
+                    high=quotation(prices[uid] * 1.001),
+                    low=quotation(prices[uid] * 0.999),
+                    close=quotation(prices[uid]),
+                    volume=100,
+                    time=timestamp(started_at - timedelta(minutes=minutes)),
+                    is_complete=True,
+                )
+                for minutes in range(5, 0, -1)
+            ]
+        )
+        recorder.record_candles(uid, protobuf_to_dataclass(candles, GetCandlesResponse))
+
+    for i in range(MESSAGES):
+        uid = rng.choice(uids)
+        step = PRICE_VOLATILITY
+        if rng.random() < PRICE_JUMP_PROBABILITY:
+            step = PRICE_JUMP
+        prices[uid] *= 1 + rng.uniform(-step, step)
+        price = quotation(prices[uid])
+        at = timestamp(started_at + MESSAGE_INTERVAL * i)
+
+        kind = rng.random()
+        if kind < 0.05:
+            response = marketdata_pb2.MarketDataResponse(
+                candle=marketdata_pb2.Candle(
+                    instrument_uid=uid,
+                    interval=marketdata_pb2.SUBSCRIPTION_INTERVAL_ONE_MINUTE,
+                    open=price,
+                    high=quotation(prices[uid] * 1.001),
+                    low=quotation(prices[uid] * 0.999),
+                    close=price,
+                    volume=rng.randint(1, 1000),
+                    time=at,
+                    last_trade_ts=at,
+                )
+            )
+        elif kind < 0.45:
+            response = marketdata_pb2.MarketDataResponse(
+                last_price=marketdata_pb2.LastPrice(
+                    instrument_uid=uid, price=price, time=at
+                )
+            )
+        else:
+            response = marketdata_pb2.MarketDataResponse(
+                trade=marketdata_pb2.Trade(
+                    instrument_uid=uid,
+                    price=price,
+                    quantity=rng.randint(1, 100),
+                    direction=rng.choice(
+                        [
+                            marketdata_pb2.TRADE_DIRECTION_BUY,
+                            marketdata_pb2.TRADE_DIRECTION_SELL,
+                        ]
+                    ),
+                    time=at,
+                )
+            )
+        recorder.record_market_data(protobuf_to_dataclass(response, MarketDataResponse))
+    recorder.close()
+
+
+async def replay(
+    recording: MarketDataRecording,
+    backend: StatistBackend,
+    speed: float | None,
+):
+    settings = MarketDataSnifferSettings(
+        statist_backend=backend,
+        # the columnar backend checks thresholds in the monitor only
+        monitor_interval=timedelta(milliseconds=10),
+        columnar_store_capacity=len(recording.shares),
+    )
+    share_stats_store = ShareStatsStore(settings)
+    instrument_cache = InstrumentCache(InstrumentCacheSettings(path=":memory:"))
+    recording.fill_instrument_cache(instrument_cache)
+    provider = ReplayBrokerClientProvider(recording, speed)
+    alert_dispatcher = CountingAlertDispatcher()
+    sniffer = MarketDataSniffer(
+        provider,
+        settings,
+        ShareInfoStatistFactory(settings, share_stats_store),
+        QuietNotifier(),
+        share_stats_store,
+        alert_dispatcher,
+        instrument_cache,
+    )
+
+    task = asyncio.create_task(sniffer.run())
+    finished = asyncio.create_task(provider.finished.wait())
+    await asyncio.wait([task, finished], return_when=asyncio.FIRST_COMPLETED)
+    # the last monitor pass picks up the final prices
+    await asyncio.sleep(settings.monitor_interval.total_seconds() * 2)
+    sniffer.stop()
+    task.cancel()
+    finished.cancel()
+    await asyncio.gather(task, finished, return_exceptions=True)
+
+    stats = provider.stats
+    latencies = sorted(stats.latencies)
+    if not latencies:
+        print(f"{backend.value:>9}: no messages replayed")
+        return
+    print(
+        f"{backend.value:>9}: {stats.messages / stats.elapsed:,.0f} messages/s,",
+        f"latency mean {statistics.mean(latencies) * 1e6:.1f}us,",
+        f"p50 {latencies[len(latencies) // 2] * 1e6:.1f}us,",
+        f"p99 {latencies[int(len(latencies) * 0.99)] * 1e6:.1f}us,",
+        f"{alert_dispatcher.alerts} alerts",
+    )
+
+
+def load_recording() -> MarketDataRecording:
+    if len(sys.argv) > 1:
+        return MarketDataRecording.load(sys.argv[1])
+    # the recording is loaded into memory, the synthetic file is not kept
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "synthetic.rec")
+        started_at = time.perf_counter()
+        synthesize_recording(path)
+        print(
+            f"synthesized {MESSAGES} messages for {SHARES} shares",
+            f"in {time.perf_counter() - started_at:.1f}s",
+        )
+        return MarketDataRecording.load(path)
+
+
+async def main():
+    recording = load_recording()
+    speed = float(sys.argv[2]) if len(sys.argv) > 2 else None
+    print(
+        f"{len(recording.market_data)} messages,",
+        f"{len(recording.shares)} shares,",
+        "max speed" if speed is None else f"speed x{speed}",
+    )
+    for backend in StatistBackend:
+        await replay(recording, backend, speed)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
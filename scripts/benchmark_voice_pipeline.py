@@ -0,0 +1,115 @@
+"""Measures per-stage latency of VoicePipeline against a local fake OpenAI server.
+
+The fake server answers with fixed delays, so the report shows how much the
+pipeline itself adds and when the first TTS byte reaches the caller.
+"""
+
+import asyncio
+import struct
+import time
+
+from aiohttp import web
+
+from m5stick.settings import OpenAISettings
+from m5stick.voice_pipeline import VoicePipeline, VoicePipelineTimings
+
+TRANSCRIPTION_DELAY = 0.3
+CHAT_DELAY = 0.5
+TTS_CHUNK_DELAY = 0.05
+TTS_CHUNKS = 40
+TTS_CHUNK_SIZE = 4096
+RUNS = 5
+
+
+async def transcriptions(request: web.Request) -> web.Response:
+    await request.read()
+    await asyncio.sleep(TRANSCRIPTION_DELAY)
+    return web.json_response({"text": "сколько сейчас времени"})
+
+
+async def chat_completions(request: web.Request) -> web.Response:
+    await request.read()
+    await asyncio.sleep(CHAT_DELAY)
+    return web.json_response(
+        {
+            "id": "fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": "fake",
+            "choices": [
+                {
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": "Сейчас полдень."},
+                }
+            ],
+        }
+    )
+
+
+async def speech(request: web.Request) -> web.StreamResponse:
+    await request.read()
+    response = web.StreamResponse(headers={"Content-Type": "audio/wav"})
+    await response.prepare(request)
+    for _ in range(TTS_CHUNKS):
+        await asyncio.sleep(TTS_CHUNK_DELAY)
+        await response.write(b"\0" * TTS_CHUNK_SIZE)
+    await response.write_eof()
+    return response
+
+
+def silent_wav(seconds: float, sample_rate: int = 16000) -> bytes:
+    pcm = b"\0\0" * int(seconds * sample_rate)
+    return (
+        b"RIFF"
+        + struct.pack("<I", 36 + len(pcm))
+        + b"WAVE"
+        + b"fmt "
+        + struct.pack("<IHHIIHH", 16, 1, 1, sample_rate, sample_rate * 2, 2, 16)
+        + b"data"
+        + struct.pack("<I", len(pcm))
+        + pcm
+    )
+
+
+async def run_pipeline(pipeline: VoicePipeline, audio_data: bytes):
+    timings = VoicePipelineTimings()
+    transcription = await pipeline.transcribe(audio_data, "benchmark.wav")
+    timings.mark("transcription")
+    reply = await pipeline.reply(transcription)
+    timings.mark("chat")
+    async for _ in pipeline.synthesize(reply):
+        if timings.first_audio_byte is None:
+            timings.mark("first_audio_byte")
+    timings.mark("synthesis")
+    print(timings)
+
+
+async def main():
+    app = web.Application()
+    app.router.add_post("/v1/audio/transcriptions", transcriptions)
+    app.router.add_post("/v1/chat/completions", chat_completions)
+    app.router.add_post("/v1/audio/speech", speech)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    pipeline = VoicePipeline(
+        OpenAISettings(api_key="fake", base_url=f"http://127.0.0.1:{port}/v1")
+    )
+    print(
+        f"fake server delays: transcription {TRANSCRIPTION_DELAY}s, chat {CHAT_DELAY}s,",
+        f"tts {TTS_CHUNKS} x {TTS_CHUNK_DELAY}s",
+    )
+    try:
+        audio_data = silent_wav(3)
+        for _ in range(RUNS):
+            await run_pipeline(pipeline, audio_data)
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
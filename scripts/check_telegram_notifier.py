@@ -0,0 +1,168 @@
+"""Checks TelegramNotifier batching, rate limits and retries against a fake Telegram.
+
+Usage: python -m scripts.check_telegram_notifier
+"""
+
+import asyncio
+import json
+import time
+from datetime import timedelta
+
+import aiohttp
+from aiohttp import web
+
+from telegram_notifier.notifier import TelegramNotifier
+from telegram_notifier.notifier_settings import TelegramNotifierSettings
+
+TOKEN = "fake-token"
+notifiers: list[TelegramNotifier] = []
+
+
+class FakeTelegram:
+    """sendMessage answering with the scripted responses first, then OK.
+
+    Texts containing "<bad>" are rejected like Telegram rejects broken HTML.
+    """
+
+    def __init__(self):
+        self.texts: list[str] = []
+        self.scripted: list[web.Response] = []
+
+    async def send_message(self, request: web.Request) -> web.Response:
+        form = await request.post()
+        self.texts.append(form["text"])
+        if self.scripted:
+            return self.scripted.pop(0)
+        if "<bad>" in form["text"]:
+            return web.json_response(
+                {"ok": False, "description": "can't parse entities"}, status=400
+            )
+        return web.json_response({"ok": True})
+
+
+def rate_limited(retry_after: int) -> web.Response:
+    return web.json_response(
+        {"ok": False, "parameters": {"retry_after": retry_after}}, status=429
+    )
+
+
+def proxy_rate_limited() -> web.Response:
+    return web.Response(
+        text="<html>Too Many Requests</html>", status=429, content_type="text/html"
+    )
+
+
+async def serve(telegram: FakeTelegram) -> tuple[web.AppRunner, str]:
+    app = web.Application()
+    app.router.add_post(f"/bot{TOKEN}/sendMessage", telegram.send_message)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+def create_notifier(api_url: str, **settings) -> TelegramNotifier:
+    """Closed by main once the check is done."""
+    notifier = TelegramNotifier(
+        TelegramNotifierSettings(
+            token=TOKEN,
+            chat_id="1",
+            api_url=api_url,
+            retry_backoff=timedelta(milliseconds=50),
+            **settings,
+        )
+    )
+    notifiers.append(notifier)
+    return notifier
+
+
+async def check_batching(telegram: FakeTelegram, api_url: str):
+    notifier = create_notifier(api_url, messages_per_second=5, messages_burst=1)
+    await notifier.send_message("message 0")
+    # the burst is used up, so these queue behind the rate limit and are merged
+    await asyncio.gather(*(notifier.send_message(f"message {i}") for i in range(1, 10)))
+    assert telegram.texts[0] == "message 0", telegram.texts
+    assert telegram.texts[1:] == ["\n".join(f"message {i}" for i in range(1, 10))]
+    assert notifier.stats.delivered_messages == 10
+    assert notifier.stats.requests == 2
+    print("batching: 10 messages in", notifier.stats.requests, "requests")
+
+
+async def check_retry_after(telegram: FakeTelegram, api_url: str):
+    notifier = create_notifier(api_url)
+    telegram.scripted = [rate_limited(retry_after=1)]
+    started_at = time.perf_counter()
+    await notifier.send_message("rate limited")
+    elapsed = time.perf_counter() - started_at
+    assert elapsed >= 1, elapsed
+    assert notifier.stats.rate_limited == 1
+    assert telegram.texts == ["rate limited"] * 2
+    print(f"retry_after: delivered after {elapsed:.2f}s")
+
+
+async def check_proxy_rate_limit(telegram: FakeTelegram, api_url: str):
+    notifier = create_notifier(api_url)
+    telegram.scripted = [proxy_rate_limited()]
+    started_at = time.perf_counter()
+    await notifier.send_message("behind a proxy")
+    elapsed = time.perf_counter() - started_at
+    assert notifier.stats.rate_limited == 1
+    assert notifier.stats.delivered_messages == 1
+    print(f"non-JSON 429: retried after the backoff, {elapsed:.2f}s")
+
+
+async def check_retry_limit(telegram: FakeTelegram, api_url: str):
+    notifier = create_notifier(api_url, max_retries=3)
+    telegram.scripted = [rate_limited(retry_after=0) for _ in range(10)]
+    try:
+        await notifier.send_message("never delivered")
+    except aiohttp.ClientResponseError as e:
+        assert e.status == 429
+    else:
+        raise AssertionError("persistent rate limit was not reported")
+    assert notifier.stats.requests == 4, notifier.stats
+    assert notifier.stats.failed_messages == 1
+    telegram.scripted = []
+    print("retry limit: gave up after", notifier.stats.requests, "requests")
+
+
+async def check_bad_message(telegram: FakeTelegram, api_url: str):
+    notifier = create_notifier(api_url, messages_per_second=5, messages_burst=1)
+    results = await asyncio.gather(
+        notifier.send_message("first"),
+        notifier.send_message("good"),
+        notifier.send_message("<bad>"),
+        notifier.send_message("also good"),
+        return_exceptions=True,
+    )
+    assert results[:2] == [None, None], results
+    assert isinstance(results[2], aiohttp.ClientResponseError), results
+    assert results[3] is None, results
+    assert notifier.stats.delivered_messages == 3
+    assert notifier.stats.failed_messages == 1
+    print("bad message: only it failed, texts sent", json.dumps(telegram.texts))
+
+
+async def main():
+    for check in (
+        check_batching,
+        check_retry_after,
+        check_proxy_rate_limit,
+        check_retry_limit,
+        check_bad_message,
+    ):
+        telegram = FakeTelegram()
+        runner, api_url = await serve(telegram)
+        try:
+            await check(telegram, api_url)
+        finally:
+            for notifier in notifiers:
+                await notifier.close()
+            notifiers.clear()
+            await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,20 +1,31 @@
-import os
-
 from dotenv import load_dotenv
-from tinkoff.invest import Client
+from tinkoff.invest import Client, InstrumentIdType, InstrumentType
 
+from invest.instrument_cache import InstrumentCache, InstrumentCacheSettings
 from invest.invest_settings import InvestSettings
 
 
 def main():
     settings = InvestSettings()
+    instrument_cache = InstrumentCache(InstrumentCacheSettings())
+    ticker = "DELI"
+
+    share = instrument_cache.get_share_by_ticker(ticker)
+    if share is not None:
+        print(share)
+        return
 
     with Client(settings.token) as client:
-        ticker = "DELI"
         r = client.instruments.find_instrument(query=ticker)
         for instrument in r.instruments:
             if instrument.api_trade_available_flag and instrument.ticker == ticker:
                 print(instrument)
+                if instrument.instrument_kind == InstrumentType.INSTRUMENT_TYPE_SHARE:
+                    share_response = client.instruments.share_by(
+                        id_type=InstrumentIdType.INSTRUMENT_ID_TYPE_UID,
+                        id=instrument.uid,
+                    )
+                    instrument_cache.put_share(share_response.instrument)
 
 
 if __name__ == "__main__":
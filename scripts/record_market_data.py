@@ -0,0 +1,63 @@
+"""Records the favorites' market data stream for offline replay.
+
+Usage: python -m scripts.record_market_data market_data.rec [seconds]
+
+Runs the regular sniffer, alerts included, with an in-memory instrument cache,
+so every watched share and its candles are fetched and recorded too.
+"""
+
+import asyncio
+import sys
+
+from dotenv import load_dotenv
+from punq import Scope
+
+from invest.client_provider import BrokerClientProvider
+from invest.instrument_cache import InstrumentCacheSettings
+from invest.invest_settings import InvestSettings
+from invest.marketdata.recording import (
+    MarketDataRecorder,
+    RecordingBrokerClientProvider,
+)
+from invest.marketdata.sniffer import MarketDataSniffer
+
+DEFAULT_DURATION = 600
+
+
+async def main():
+    load_dotenv()
+
+    from deps import get_container
+
+    path = sys.argv[1]
+    duration = float(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_DURATION
+
+    recorder = MarketDataRecorder(path)
+    container = get_container()
+    container.register(
+        InstrumentCacheSettings,
+        instance=InstrumentCacheSettings(path=":memory:"),
+        scope=Scope.singleton,
+    )
+    provider = RecordingBrokerClientProvider(
+        container.resolve(InvestSettings), recorder
+    )
+    container.register(BrokerClientProvider, instance=provider, scope=Scope.singleton)
+    sniffer = container.resolve(MarketDataSniffer)
+
+    task = asyncio.create_task(sniffer.run())
+    try:
+        await asyncio.wait_for(asyncio.shield(task), duration)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        sniffer.stop()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await provider.close()
+        recorder.close()
+    print(f"{recorder.records} records written to {path}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
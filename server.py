@@ -1,18 +1,21 @@
 import asyncio
-import os
-from datetime import datetime
-import io
+from email.utils import format_datetime, parsedate_to_datetime
 import logging
-import openai
+from pathlib import Path
+from typing import AsyncIterator
 
 from fastapi import FastAPI, Response, Query
 from starlette.requests import Request
-from starlette.responses import HTMLResponse, FileResponse
+from starlette.responses import HTMLResponse, FileResponse, StreamingResponse
 
-from invest.marketdata.sniffer import MarketDataSniffer
-from rss.rss import RSSFeeder
+from invest.client_provider import BrokerClientProvider
+from rss.rss import RSSFeeder, RenderedFeed
 from static.path import STATIC_PATH
-from m5stick.settings import OpenAISettings, AudioSettings
+from m5stick.audio_storage import AudioStorage, AudioWriter
+from m5stick.preprocessing import AudioPreprocessor
+from m5stick.response_cache import VoiceResponseCache
+from m5stick.settings import AudioSettings
+from m5stick.voice_pipeline import VoicePipeline, VoicePipelineTimings
 
 logger = logging.getLogger(__name__)
 
@@ -23,34 +26,66 @@ class RSSServer(FastAPI):
     def __init__(
         self,
         feeder: RSSFeeder,
-        market_data_sniffer: MarketDataSniffer,
-        openai_settings: OpenAISettings,
+        voice_pipeline: VoicePipeline,
         audio_settings: AudioSettings,
+        audio_storage: AudioStorage,
+        voice_response_cache: VoiceResponseCache,
+        audio_preprocessor: AudioPreprocessor,
+        broker_client_provider: BrokerClientProvider,
     ):
         super().__init__()
         self._feeder = feeder
-        self._market_data_sniffer = market_data_sniffer
-        self._openai_settings = openai_settings
+        self._voice_pipeline = voice_pipeline
         self._audio_settings = audio_settings
-
-        openai.api_key = self._openai_settings.api_key
+        self._audio_storage = audio_storage
+        self._voice_response_cache = voice_response_cache
+        self._audio_preprocessor = audio_preprocessor
+        self._audio_retention: asyncio.Task | None = None
+        self._broker_client_provider = broker_client_provider
 
         self.add_api_route("/feed", endpoint=self.get_feed, methods=["GET"])
         self.add_api_route("/html_render", endpoint=self.html_render, methods=["GET"])
         self.add_api_route("/get_file", endpoint=self.get_file, methods=["GET"])
         self.add_api_route("/audio", endpoint=self.audio, methods=["POST"])
-        # self.on_event("startup")(self.on_startup)
-        # self.on_event("shutdown")(self.on_shutdown)
+        self.add_api_route("/audio/pcm", endpoint=self.audio_pcm, methods=["POST"])
+        self.add_event_handler("startup", self._start_audio_retention)
+        self.add_event_handler("shutdown", self._stop_audio_retention)
+        self.add_event_handler("shutdown", self._broker_client_provider.close)
 
-    async def on_startup(self):
-        asyncio.create_task(self._market_data_sniffer.run())
+    async def _start_audio_retention(self):
+        self._audio_retention = asyncio.create_task(self._audio_storage.run_retention())
 
-    async def on_shutdown(self):
-        self._market_data_sniffer.stop()
+    async def _stop_audio_retention(self):
+        if self._audio_retention is not None:
+            self._audio_retention.cancel()
 
     async def get_feed(self, request: Request) -> Response:
-        feed = await self._feeder.get_feed()
-        return Response(content=feed.rss(), media_type="application/xml")
+        feed = await self._feeder.get_rendered_feed()
+        headers = {
+            "ETag": feed.etag,
+            "Last-Modified": format_datetime(feed.last_modified, usegmt=True),
+        }
+        if self._is_not_modified(request, feed):
+            return Response(status_code=304, headers=headers)
+        return Response(
+            content=feed.content, media_type="application/xml", headers=headers
+        )
+
+    def _is_not_modified(self, request: Request, feed: RenderedFeed) -> bool:
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            etags = {
+                etag.strip().removeprefix("W/") for etag in if_none_match.split(",")
+            }
+            return "*" in etags or feed.etag in etags
+
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since is not None:
+            try:
+                return feed.last_modified <= parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+        return False
 
     async def html_render(self, raw_html: str = Query(...)) -> Response:
         return HTMLResponse(content=raw_html)
@@ -60,88 +95,144 @@ class RSSServer(FastAPI):
 
     async def audio(self, request: Request) -> Response:
         try:
-            audio_data = await request.body()
+            # Stream original audio file to disk while it is uploaded
+            recording_id = self._audio_storage.new_recording_id()
+            filepath, audio_data = await self._audio_storage.save_stream(
+                request.stream(), self._audio_settings.filename_prefix, recording_id
+            )
 
             if not audio_data:
                 return Response(content="No audio data received", status_code=400)
+            logger.info(f"Original audio saved: {filepath}")
 
-            # Create upload directory
-            os.makedirs(self._audio_settings.upload_dir, exist_ok=True)
+            return await self._answer_voice(audio_data, filepath, recording_id)
 
-            # Generate filenames with timestamp
-            timestamp = datetime.now().strftime(self._audio_settings.timestamp_format)
-            filename = f"{self._audio_settings.filename_prefix}_{timestamp}.wav"
-            filepath = os.path.join(self._audio_settings.upload_dir, filename)
+        except Exception as e:
+            return Response(content=f"Error saving audio: {str(e)}", status_code=500)
 
-            # Save original audio file
-            with open(filepath, "wb") as f:
-                f.write(audio_data)
+    async def audio_pcm(
+        self,
+        request: Request,
+        sample_rate: int = Query(16000),
+        bits: int = Query(16),
+        channels: int = Query(1),
+    ) -> Response:
+        """Accepts raw PCM streamed while it is recorded, e.g. chunked by the device.
+
+        The recording is on disk by the time the device stops, so the pipeline
+        starts right after the last chunk instead of after a full upload.
+        """
+        try:
+            recording_id = self._audio_storage.new_recording_id()
+            filepath, audio_data = await self._audio_storage.save_pcm_stream(
+                request.stream(),
+                self._audio_settings.filename_prefix,
+                recording_id,
+                sample_rate=sample_rate,
+                bits=bits,
+                channels=channels,
+            )
+
+            if not audio_data:
+                return Response(content="No audio data received", status_code=400)
             logger.info(f"Original audio saved: {filepath}")
 
-            transcription = ""
-            synthesized_audio = audio_data
+            return await self._answer_voice(audio_data, filepath, recording_id)
 
-            try:
-                # Step 1: Convert audio to text using Whisper
-                audio_file = io.BytesIO(audio_data)
-                audio_file.name = filename
+        except Exception as e:
+            return Response(content=f"Error saving audio: {str(e)}", status_code=500)
 
-                transcript = openai.audio.transcriptions.create(
-                    model=self._openai_settings.whisper_model, file=audio_file
-                )
-                transcription = transcript.text
-                logger.info(f"Transcription text: {transcription}")
-
-                # Step 2: Generate chat response using GPT
-                chat_response_text = transcription
-                if transcription.strip():
-                    chat_response = openai.chat.completions.create(
-                        model=self._openai_settings.chat_model,
-                        messages=[
-                            {
-                                "role": "system",
-                                "content": self._openai_settings.system_prompt,
-                            },
-                            {"role": "user", "content": transcription},
-                        ],
-                        max_tokens=self._openai_settings.max_tokens,
-                        temperature=self._openai_settings.temperature,
-                    )
-                    chat_response_text = chat_response.choices[
-                        0
-                    ].message.content.strip()
-                    logger.info(f"Chat response: {chat_response_text}")
-
-                # Step 3: Convert chat response to audio using TTS
-                if chat_response_text.strip():
-                    tts_response = openai.audio.speech.create(
-                        model=self._openai_settings.tts_model,
-                        voice=self._openai_settings.tts_voice,
-                        instructions=self._openai_settings.tts_instructions,
-                        input=chat_response_text,
-                        response_format=self._openai_settings.response_format,
-                    )
-                    synthesized_audio = tts_response.content
-
-                    # Save synthesized audio file
-                    tts_filename = (
-                        f"{self._audio_settings.tts_filename_prefix}_{timestamp}.wav"
-                    )
-                    tts_filepath = os.path.join(
-                        self._audio_settings.upload_dir, tts_filename
-                    )
-                    with open(tts_filepath, "wb") as f:
-                        f.write(synthesized_audio)
-                    logger.info(f"Synthesized audio saved: {tts_filepath}")
-                    logger.info(f"Original text: {transcription}")
-                    logger.info(f"Response text: {chat_response_text}")
-
-            except Exception as e:
-                logger.error(f"OpenAI API error: {str(e)}")
-
-            return Response(
-                content=synthesized_audio, media_type="audio/wav", status_code=200
+    async def _answer_voice(
+        self, audio_data: bytes, filepath: Path, recording_id: str
+    ) -> Response:
+        timings = VoicePipelineTimings()
+        try:
+            # Step 0: Trim silence and shrink audio before uploading it
+            whisper_audio = await asyncio.to_thread(
+                self._audio_preprocessor.process, audio_data
+            )
+            timings.mark("preprocessing")
+            logger.info(
+                f"Preprocessed audio: {len(audio_data)} -> {len(whisper_audio)} bytes"
+            )
+
+            # Step 1: Convert audio to text using Whisper
+            transcription = await self._voice_pipeline.transcribe(
+                whisper_audio, filepath.name
             )
+            timings.mark("transcription")
+            logger.info(f"Transcription text: {transcription}")
+
+            cached_response = self._voice_response_cache.get(transcription)
+            if cached_response is not None:
+                logger.info(f"Cached response: {cached_response.text}")
+                logger.info(f"Voice pipeline timings: {timings}")
+                return Response(
+                    content=cached_response.audio,
+                    media_type="audio/wav",
+                    status_code=200,
+                )
+
+            # Step 2: Generate chat response using GPT
+            chat_response_text = transcription
+            if transcription.strip():
+                chat_response_text = await self._voice_pipeline.reply(transcription)
+                timings.mark("chat")
+                logger.info(f"Chat response: {chat_response_text}")
+
+            # Step 3: Stream chat response audio from TTS while it is generated
+            if chat_response_text.strip():
+                tts_chunks = self._voice_pipeline.synthesize(chat_response_text)
+                first_chunk = await anext(tts_chunks)
+                timings.mark("first_audio_byte")
+
+                tts_writer = self._audio_storage.open_writer(
+                    self._audio_settings.tts_filename_prefix, recording_id
+                )
+                return StreamingResponse(
+                    self._stream_synthesized_audio(
+                        first_chunk,
+                        tts_chunks,
+                        tts_writer,
+                        timings,
+                        transcription,
+                        chat_response_text,
+                    ),
+                    media_type="audio/wav",
+                )
 
         except Exception as e:
-            return Response(content=f"Error saving audio: {str(e)}", status_code=500)
+            logger.error(f"OpenAI API error: {str(e)}")
+
+        logger.info(f"Voice pipeline timings: {timings}")
+        return Response(content=audio_data, media_type="audio/wav", status_code=200)
+
+    async def _stream_synthesized_audio(
+        self,
+        first_chunk: bytes,
+        tts_chunks: AsyncIterator[bytes],
+        tts_writer: AudioWriter,
+        timings: VoicePipelineTimings,
+        transcription: str,
+        chat_response_text: str,
+    ) -> AsyncIterator[bytes]:
+        # Save synthesized audio file as it is streamed to the device
+        synthesized_audio = bytearray(first_chunk)
+        try:
+            await tts_writer.write(first_chunk)
+            yield first_chunk
+            async for chunk in tts_chunks:
+                synthesized_audio.extend(chunk)
+                await tts_writer.write(chunk)
+                yield chunk
+        except Exception as e:
+            logger.error(f"OpenAI API error: {str(e)}")
+            return
+        finally:
+            await tts_writer.close()
+        timings.mark("synthesis")
+        logger.info(f"Voice pipeline timings: {timings}")
+        logger.info(f"Synthesized audio saved: {tts_writer.path}")
+        self._voice_response_cache.put(
+            transcription, chat_response_text, bytes(synthesized_audio)
+        )
@@ -0,0 +1,109 @@
+import hashlib
+from datetime import timedelta
+
+import aiohttp
+
+
+class SmallTVClient:
+    """Async client of one SmallTV display over a keep-alive session.
+
+    Frames are written into a fixed ring of file slots on the device, so its
+    flash never fills up and nothing has to be cleared. A frame that is
+    already in a slot is switched to instead of being uploaded again.
+    """
+
+    def __init__(
+        self,
+        server: str,
+        directory: str = "/image/",
+        slots: int = 4,
+        timeout: timedelta = timedelta(seconds=5),
+    ):
+        if slots < 2:
+            raise ValueError(
+                "at least two slots are needed to not overwrite the shown frame"
+            )
+        self.server = server
+        self._directory = directory
+        self._timeout = aiohttp.ClientTimeout(total=timeout.total_seconds())
+        self._session: aiohttp.ClientSession | None = None
+
+        self._slot_digests: list[bytes | None] = [None] * slots
+        self._shown_slot: int | None = None
+        self._next_slot = 0
+
+        self.uploads = 0
+        self.skipped = 0
+
+    async def show(self, image: bytes) -> bool:
+        """Shows the frame, returns whether it had to be uploaded."""
+        digest = hashlib.sha256(image).digest()
+        if digest in self._slot_digests:
+            slot = self._slot_digests.index(digest)
+            if slot != self._shown_slot:
+                await self.set_image(self._slot_filename(slot))
+                self._shown_slot = slot
+            self.skipped += 1
+            return False
+
+        slot = self._next_slot
+        if slot == self._shown_slot:
+            slot = (slot + 1) % len(self._slot_digests)
+        self._next_slot = (slot + 1) % len(self._slot_digests)
+
+        # the slot content is unknown until the upload succeeds
+        self._slot_digests[slot] = None
+        await self.upload_image(image, self._slot_filename(slot))
+        self._slot_digests[slot] = digest
+        await self.set_image(self._slot_filename(slot))
+        self._shown_slot = slot
+        self.uploads += 1
+        return True
+
+    async def upload_image(self, image: bytes, filename: str):
+        data = aiohttp.FormData()
+        data.add_field("file", image, filename=filename, content_type="image/jpeg")
+        headers = {
+            "Origin": self.server,
+            "Referer": f"{self.server}/image.html",
+            "X-Requested-With": "XMLHttpRequest",
+        }
+        async with self._get_session().post(
+            f"{self.server}/doUpload",
+            params={"dir": self._directory},
+            data=data,
+            headers=headers,
+        ) as resp:
+            resp.raise_for_status()
+            await resp.read()
+
+    async def set_image(self, filename: str):
+        await self._set({"img": f"{self._directory}{filename}"})
+
+    async def clear(self):
+        await self._set({"clear": self._directory.strip("/")})
+        self._slot_digests = [None] * len(self._slot_digests)
+        self._shown_slot = None
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _set(self, params: dict[str, str]):
+        async with self._get_session().get(f"{self.server}/set", params=params) as resp:
+            resp.raise_for_status()
+            await resp.read()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None:
+            # the device serves one request at a time, keep a single connection
+            self._session = aiohttp.ClientSession(
+                timeout=self._timeout,
+                connector=aiohttp.TCPConnector(limit=1),
+            )
+        return self._session
+
+    @staticmethod
+    def _slot_filename(slot: int) -> str:
+        return f"frame_{slot}.jpg"
@@ -0,0 +1,130 @@
+import asyncio
+import dataclasses
+import random
+import time
+
+from smalltv.client import SmallTVClient
+from smalltv.settings import SmallTVSettings
+
+
+@dataclasses.dataclass
+class DisplayHealth:
+    uploads: int = 0
+    failures: int = 0
+    failures_in_row: int = 0
+    # frames replaced by a newer one before the display tried to show them
+    dropped: int = 0
+    last_error: str | None = None
+    last_success_at: float | None = None
+
+    @property
+    def is_healthy(self) -> bool:
+        return self.failures_in_row == 0
+
+
+class SmallTVDisplay:
+    """Uploads frames to one display from its own task.
+
+    Only the newest frame is kept, so a slow display skips frames instead of
+    queueing them, and failures back off without touching other displays.
+    """
+
+    def __init__(self, client: SmallTVClient, settings: SmallTVSettings):
+        self.client = client
+        self._settings = settings
+        self.health = DisplayHealth()
+        self._frame: bytes | None = None
+        # the pending frame failed to upload once, replacing it is not a drop
+        self._is_retry = False
+        self._has_frame = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.client.close()
+
+    def submit(self, frame: bytes):
+        if self._frame is not None and not self._is_retry:
+            self.health.dropped += 1
+        self._frame = frame
+        self._is_retry = False
+        self._has_frame.set()
+
+    async def _run(self):
+        while True:
+            await self._has_frame.wait()
+            self._has_frame.clear()
+            frame, self._frame = self._frame, None
+            self._is_retry = False
+            try:
+                await self.client.show(frame)
+            except Exception as e:
+                # retried after the backoff unless a newer frame arrived meanwhile
+                if self._frame is None:
+                    self._frame = frame
+                    self._is_retry = True
+                    self._has_frame.set()
+                await self._on_failure(e)
+                continue
+            if not self.health.is_healthy:
+                print("smalltv display recovered", self.client.server)
+            self.health.uploads += 1
+            self.health.failures_in_row = 0
+            self.health.last_success_at = time.time()
+
+    async def _on_failure(self, e: Exception):
+        self.health.failures += 1
+        self.health.failures_in_row += 1
+        self.health.last_error = str(e) or type(e).__name__
+        if self.health.failures_in_row == 1:
+            print("smalltv display failed", self.client.server, self.health.last_error)
+        # the next frame is shown after the backoff, the newer one if any arrived
+        await asyncio.sleep(self._backoff_delay())
+
+    def _backoff_delay(self) -> float:
+        delay = min(
+            self._settings.backoff_min.total_seconds()
+            * 2 ** (self.health.failures_in_row - 1),
+            self._settings.backoff_max.total_seconds(),
+        )
+        return random.uniform(delay / 2, delay)
+
+
+class SmallTVDisplays:
+    """Fans every rendered frame out to all configured displays at once."""
+
+    def __init__(self, small_tv_settings: SmallTVSettings):
+        self._settings = small_tv_settings
+        self.displays = [
+            SmallTVDisplay(
+                SmallTVClient(
+                    server,
+                    directory=self._settings.directory,
+                    slots=self._settings.slots,
+                    timeout=self._settings.request_timeout,
+                ),
+                self._settings,
+            )
+            for server in self._settings.servers
+        ]
+
+    def start(self):
+        for display in self.displays:
+            display.start()
+
+    async def stop(self):
+        await asyncio.gather(*(display.stop() for display in self.displays))
+
+    def show(self, frame: bytes):
+        for display in self.displays:
+            display.submit(frame)
+
+    @property
+    def health(self) -> dict[str, DisplayHealth]:
+        return {display.client.server: display.health for display in self.displays}
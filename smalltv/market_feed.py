@@ -0,0 +1,140 @@
+import asyncio
+import time
+from collections import deque
+
+from dotenv import load_dotenv
+from tinkoff.invest import Candle, Share
+from tinkoff.invest.utils import quotation_to_decimal
+
+from invest.marketdata.sniffer import MarketDataSniffer
+from smalltv.displays import SmallTVDisplays
+from smalltv.renderer import OHLC, CandlestickRenderer
+from smalltv.settings import SmallTVSettings
+
+
+class SmallTVMarketFeed:
+    """Shows candles the sniffer observes on the SmallTV, rotating top movers.
+
+    A frame is rendered only when the shown share gets a new candle or the
+    rotation switches shares, and uploaded only when its pixels changed.
+    """
+
+    def __init__(
+        self,
+        market_data_sniffer: MarketDataSniffer,
+        small_tv_displays: SmallTVDisplays,
+        small_tv_settings: SmallTVSettings,
+    ):
+        self._displays = small_tv_displays
+        self._settings = small_tv_settings
+        self._renderer = CandlestickRenderer(
+            candles=self._settings.candles, time_format="%H:%M"
+        )
+
+        self._candles: dict[str, deque[OHLC]] = {}
+        self._tickers: dict[str, str] = {}
+        # bumped on every candle, tells whether the shown share needs a new frame
+        self._versions: dict[str, int] = {}
+        self._updated = asyncio.Event()
+
+        self._movers: list[str] = []
+        self._rotation_index = 0
+        self._rotated_at = 0.0
+        self._rendered: tuple[str, int] | None = None
+
+        market_data_sniffer.add_candle_listener(self.on_candle)
+
+    def on_candle(self, share: Share, candle: Candle):
+        candles = self._candles.setdefault(
+            share.uid, deque(maxlen=self._settings.candles)
+        )
+        ohlc = (
+            candle.time,
+            float(quotation_to_decimal(candle.open)),
+            float(quotation_to_decimal(candle.high)),
+            float(quotation_to_decimal(candle.low)),
+            float(quotation_to_decimal(candle.close)),
+        )
+        if candles and candles[-1][0] > candle.time:
+            return
+        if candles and candles[-1][0] == candle.time:
+            candles[-1] = ohlc
+        else:
+            candles.append(ohlc)
+        self._tickers[share.uid] = share.ticker
+        self._versions[share.uid] = self._versions.get(share.uid, 0) + 1
+
+        shown_uid = self._shown_uid()
+        if shown_uid is None or shown_uid == share.uid:
+            self._updated.set()
+
+    async def run(self):
+        self._displays.start()
+        try:
+            await self._run()
+        finally:
+            await self._displays.stop()
+
+    async def _run(self):
+        rotation_interval = self._settings.rotation_interval.total_seconds()
+        while True:
+            timeout = rotation_interval - (time.monotonic() - self._rotated_at)
+            try:
+                await asyncio.wait_for(self._updated.wait(), max(0.0, timeout))
+            except asyncio.TimeoutError:
+                pass
+            self._updated.clear()
+
+            if (
+                self._shown_uid() is None
+                or time.monotonic() - self._rotated_at >= rotation_interval
+            ):
+                self._rotate()
+            uid = self._shown_uid()
+            if uid is None or self._rendered == (uid, self._versions[uid]):
+                continue
+            self._rendered = (uid, self._versions[uid])
+            try:
+                await self._show(uid)
+            except Exception as e:
+                print("smalltv exception", e)
+
+    def _shown_uid(self) -> str | None:
+        if not self._movers:
+            return None
+        return self._movers[self._rotation_index % len(self._movers)]
+
+    def _rotate(self):
+        self._rotated_at = time.monotonic()
+        self._movers = sorted(
+            self._candles, key=lambda uid: abs(self._change_percent(uid)), reverse=True
+        )[: self._settings.top_movers]
+        self._rotation_index += 1
+
+    def _change_percent(self, uid: str) -> float:
+        candles = self._candles[uid]
+        first_open, last_close = candles[0][1], candles[-1][4]
+        if not first_open:
+            return 0.0
+        return (last_close - first_open) / first_open * 100
+
+    async def _show(self, uid: str):
+        title = f"{self._tickers[uid]} {self._change_percent(uid):+.2f}%"
+        frame = await asyncio.to_thread(
+            self._renderer.render, list(self._candles[uid]), title
+        )
+        self._displays.show(frame)
+
+
+async def main():
+    from deps import get_container
+
+    container = get_container()
+    sniffer = container.resolve(MarketDataSniffer)
+    feed = container.resolve(SmallTVMarketFeed)
+    await asyncio.gather(sniffer.run(), feed.run())
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    asyncio.run(main())
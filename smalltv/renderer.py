@@ -0,0 +1,110 @@
+import datetime
+import io
+from typing import Sequence
+
+from PIL import Image
+from matplotlib import style
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.patches import Rectangle
+
+# (date, open, high, low, close)
+OHLC = tuple[datetime.datetime, float, float, float, float]
+
+CANDLE_WIDTH = 0.6
+UP_COLOR = "lime"
+DOWN_COLOR = "crimson"
+
+
+class CandlestickRenderer:
+    """Renders candlestick frames for the SmallTV display.
+
+    One figure and its artists live as long as the renderer, every frame only
+    updates the candles that changed and is drawn straight into a JPEG of the
+    display size.
+    """
+
+    def __init__(
+        self,
+        candles: int = 10,
+        size: int = 240,
+        dpi: int = 80,
+        jpeg_quality: int = 90,
+        time_format: str = "%m-%d",
+    ):
+        self._candles = candles
+        self._size = size
+        self._jpeg_quality = jpeg_quality
+        self._time_format = time_format
+        self._drawn: list[OHLC | None] = [None] * candles
+        self._drawn_labels: list[str] | None = None
+
+        with style.context("dark_background"):
+            self._figure = Figure(figsize=(size / dpi, size / dpi), dpi=dpi)
+            self._canvas = FigureCanvasAgg(self._figure)
+            self._figure.patch.set_facecolor("black")
+            self._figure.subplots_adjust(left=0.2, right=0.97, top=0.88, bottom=0.2)
+            self._ax = self._figure.add_subplot()
+            self._ax.set_facecolor("black")
+            self._ax.set_xlim(-0.5, candles - 0.5)
+            self._ax.set_xticks(range(candles))
+            self._ax.tick_params(axis="x", colors="white", labelsize=7, rotation=45)
+            self._ax.tick_params(axis="y", colors="white", labelsize=7)
+            self._title = self._ax.set_title("", color="white", fontsize=11)
+
+            self._wicks = [
+                self._ax.plot([idx, idx], [0, 0], color="lightgray", linewidth=1)[0]
+                for idx in range(candles)
+            ]
+            self._bodies = []
+            for idx in range(candles):
+                body = Rectangle(
+                    (idx - CANDLE_WIDTH / 2, 0),
+                    CANDLE_WIDTH,
+                    0,
+                    edgecolor="white",
+                    linewidth=0.5,
+                )
+                self._ax.add_patch(body)
+                self._bodies.append(body)
+
+    def render(self, ohlc: Sequence[OHLC], title: str = "") -> bytes:
+        ohlc = ohlc[-self._candles :]
+        for idx in range(self._candles):
+            candle = ohlc[idx] if idx < len(ohlc) else None
+            if candle == self._drawn[idx]:
+                continue
+            self._drawn[idx] = candle
+            self._wicks[idx].set_visible(candle is not None)
+            self._bodies[idx].set_visible(candle is not None)
+            if candle is not None:
+                self._update_candle(idx, *candle[1:])
+
+        if ohlc:
+            low = min(candle[3] for candle in ohlc)
+            high = max(candle[2] for candle in ohlc)
+            padding = (high - low) * 0.05 or abs(high) * 0.01 or 1
+            self._ax.set_ylim(low - padding, high + padding)
+        labels = [candle[0].strftime(self._time_format) for candle in ohlc]
+        labels += [""] * (self._candles - len(ohlc))
+        if labels != self._drawn_labels:
+            self._ax.set_xticklabels(labels)
+            self._drawn_labels = labels
+        self._title.set_text(title)
+
+        self._canvas.draw()
+        image = Image.frombuffer(
+            "RGBA", self._canvas.get_width_height(), self._canvas.buffer_rgba()
+        ).convert("RGB")
+        if image.size != (self._size, self._size):
+            image = image.resize((self._size, self._size), Image.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, "JPEG", quality=self._jpeg_quality)
+        return buffer.getvalue()
+
+    def _update_candle(self, idx: int, o: float, high: float, low: float, c: float):
+        self._wicks[idx].set_ydata([low, high])
+        body = self._bodies[idx]
+        body.set_y(min(o, c))
+        body.set_height(abs(c - o))
+        body.set_facecolor(UP_COLOR if c >= o else DOWN_COLOR)
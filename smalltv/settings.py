@@ -0,0 +1,23 @@
+from datetime import timedelta
+
+from pydantic.v1 import BaseSettings
+
+
+class SmallTVSettings(BaseSettings):
+    # every frame is rendered once and shown on all of these displays
+    servers: list[str] = ["http://192.168.1.153"]
+    directory: str = "/image/"
+    # frames rotate through this many files on the device
+    slots: int = 4
+    request_timeout: timedelta = timedelta(seconds=5)
+    # a failing display is retried after a backoff growing up to backoff_max
+    backoff_min: timedelta = timedelta(seconds=1)
+    backoff_max: timedelta = timedelta(minutes=1)
+
+    # market feed: candles of the top movers are shown in turn
+    candles: int = 10
+    top_movers: int = 5
+    rotation_interval: timedelta = timedelta(seconds=15)
+
+    class Config:
+        env_prefix = "SMALLTV_"
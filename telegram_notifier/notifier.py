@@ -1,9 +1,30 @@
 import asyncio
+import dataclasses
+from collections import deque
 
 import aiohttp
 from dotenv import load_dotenv
 
 from telegram_notifier.notifier_settings import TelegramNotifierSettings
+from telegram_notifier.token_bucket import TokenBucket
+
+
+@dataclasses.dataclass
+class TelegramDeliveryStats:
+    queued_messages: int = 0
+    delivered_messages: int = 0
+    failed_messages: int = 0
+    # one request may deliver several merged messages
+    requests: int = 0
+    rate_limited: int = 0
+    retries: int = 0
+
+
+@dataclasses.dataclass
+class _OutgoingMessage:
+    text: str
+    parse_mode: str
+    delivered: asyncio.Future
 
 
 class TelegramNotifier:
@@ -11,20 +32,159 @@ class TelegramNotifier:
         self._settings = telegram_notifier_settings
         self._aiohttp_session = aiohttp.ClientSession()
         self._send_message_url = (
-            f"https://api.telegram.org/bot{self._settings.token}/sendMessage"
+            f"{self._settings.api_url}/bot{self._settings.token}/sendMessage"
+        )
+
+        self._token_bucket = TokenBucket(
+            rate=self._settings.messages_per_second,
+            capacity=self._settings.messages_burst,
         )
+        self._outgoing: deque[_OutgoingMessage] = deque()
+        self._has_outgoing = asyncio.Event()
+        self._sender_task: asyncio.Task | None = None
+
+        self.stats = TelegramDeliveryStats()
 
     async def send_message(self, message, parse_mode="HTML"):
+        """Queues the message and waits until it is delivered.
+
+        Messages queued while the sender is paced by the rate limit are merged
+        into as few requests as Telegram's text limit allows.
+        """
+        outgoing = _OutgoingMessage(
+            text=message,
+            parse_mode=parse_mode,
+            delivered=asyncio.get_running_loop().create_future(),
+        )
+        self._outgoing.append(outgoing)
+        self.stats.queued_messages += 1
+        self._has_outgoing.set()
+        if self._sender_task is None or self._sender_task.done():
+            self._sender_task = asyncio.create_task(self._send_outgoing())
+        await outgoing.delivered
+
+    async def close(self):
+        if self._sender_task is not None:
+            self._sender_task.cancel()
+            await asyncio.gather(self._sender_task, return_exceptions=True)
+        await self._aiohttp_session.close()
+
+    async def _send_outgoing(self):
+        while True:
+            while not self._outgoing:
+                self._has_outgoing.clear()
+                await self._has_outgoing.wait()
+            await self._token_bucket.acquire()
+            batch = self._pop_batch()
+            try:
+                await self._post_with_retries(
+                    text="\n".join(outgoing.text for outgoing in batch),
+                    parse_mode=batch[0].parse_mode,
+                )
+            except aiohttp.ClientResponseError as e:
+                if len(batch) > 1 and 400 <= e.status < 500:
+                    # one bad message must not fail the ones merged with it
+                    await self._send_one_by_one(batch)
+                else:
+                    self._fail(batch, e)
+            except Exception as e:
+                self._fail(batch, e)
+            else:
+                self._deliver(batch)
+
+    async def _send_one_by_one(self, batch: list[_OutgoingMessage]):
+        for outgoing in batch:
+            await self._token_bucket.acquire()
+            try:
+                await self._post_with_retries(
+                    text=outgoing.text, parse_mode=outgoing.parse_mode
+                )
+            except Exception as e:
+                self._fail([outgoing], e)
+            else:
+                self._deliver([outgoing])
+
+    def _deliver(self, batch: list[_OutgoingMessage]):
+        self.stats.delivered_messages += len(batch)
+        for outgoing in batch:
+            if not outgoing.delivered.done():
+                outgoing.delivered.set_result(None)
+
+    def _fail(self, batch: list[_OutgoingMessage], e: Exception):
+        self.stats.failed_messages += len(batch)
+        for outgoing in batch:
+            if not outgoing.delivered.done():
+                outgoing.delivered.set_exception(e)
+
+    def _pop_batch(self) -> list[_OutgoingMessage]:
+        batch = [self._outgoing.popleft()]
+        length = len(batch[0].text)
+        while self._outgoing:
+            following = self._outgoing[0]
+            if (
+                following.parse_mode != batch[0].parse_mode
+                or length + 1 + len(following.text) > self._settings.max_message_length
+            ):
+                break
+            batch.append(self._outgoing.popleft())
+            length += 1 + len(following.text)
+        return batch
+
+    async def _post_with_retries(self, text: str, parse_mode: str):
         data = {
             "chat_id": self._settings.chat_id,
-            "text": message,
+            "text": text,
             "parse_mode": parse_mode,
         }
-        async with self._aiohttp_session.post(
-            self._send_message_url, data=data
-        ) as response:
-            print(await response.text())
-            response.raise_for_status()
+        backoff = self._settings.retry_backoff.total_seconds()
+        attempt = 0
+        while True:
+            self.stats.requests += 1
+            delay = None
+            try:
+                async with self._aiohttp_session.post(
+                    self._send_message_url, data=data
+                ) as response:
+                    if response.status == 429:
+                        delay = await self._get_retry_after(response, backoff)
+                        self.stats.rate_limited += 1
+                        self._token_bucket.drain()
+                        print("Telegram rate limit, retry after", delay)
+                        response.raise_for_status()
+                    if response.status < 500:
+                        if not response.ok:
+                            print(await response.text())
+                        response.raise_for_status()
+                        return
+                    print(await response.text())
+                    response.raise_for_status()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                error = e
+            except aiohttp.ClientResponseError as e:
+                if e.status < 500 and e.status != 429:
+                    raise
+                error = e
+
+            # rate limits count too, so a persistent one does not block the queue
+            attempt += 1
+            if attempt > self._settings.max_retries:
+                raise error
+            self.stats.retries += 1
+            if delay is not None:
+                await asyncio.sleep(delay)
+                continue
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, self._settings.max_retry_backoff.total_seconds())
+
+    async def _get_retry_after(
+        self, response: aiohttp.ClientResponse, backoff: float
+    ) -> float:
+        try:
+            body = await response.json(content_type=None)
+            return float(body["parameters"]["retry_after"])
+        except (ValueError, KeyError, TypeError):
+            # not Telegram's JSON, e.g. an error page of a proxy
+            return backoff
 
     async def send_mini_app(self):
         data = {
@@ -1,9 +1,21 @@
+from datetime import timedelta
+
 from pydantic.v1 import BaseSettings
 
 
 class TelegramNotifierSettings(BaseSettings):
     token: str
     chat_id: str
+    api_url: str = "https://api.telegram.org"
+
+    # Telegram allows about one message per second to the same chat
+    messages_per_second: float = 1
+    messages_burst: int = 3
+    # queued messages are merged into one up to Telegram's text limit
+    max_message_length: int = 4096
+    max_retries: int = 5
+    retry_backoff: timedelta = timedelta(seconds=1)
+    max_retry_backoff: timedelta = timedelta(seconds=60)
 
     class Config:
         env_prefix = "TELEGRAM_"
@@ -0,0 +1,30 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    """Paces callers to ``rate`` acquisitions per second with bursts up to ``capacity``."""
+
+    def __init__(self, rate: float, capacity: int):
+        self._rate = rate
+        self._capacity = capacity
+        self._tokens = float(capacity)
+        self._updated_at = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            current_time = time.monotonic()
+            self._tokens = min(
+                self._capacity,
+                self._tokens + (current_time - self._updated_at) * self._rate,
+            )
+            self._updated_at = current_time
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self._rate)
+
+    def drain(self):
+        """Empties the bucket, e.g. after the server reported a rate limit."""
+        self._tokens = 0
+        self._updated_at = time.monotonic()